@@ -5,9 +5,11 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 
+from app.db_engine import RoutingSession
+
 load_dotenv()
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 migrate = Migrate()
 
 def create_app():
@@ -36,12 +38,66 @@ def create_app():
         if env_db.startswith("postgres://"):
             env_db = env_db.replace("postgres://", "postgresql://", 1)
         app.config['SQLALCHEMY_DATABASE_URI'] = env_db
+    # Read replica for @read_only views (see app.replica); unset = everything on the primary
+    replica_db = (os.getenv('DATABASE_REPLICA_URL') or '').strip()
+    if replica_db.startswith("postgres://"):
+        replica_db = replica_db.replace("postgres://", "postgresql://", 1)
+    app.config['DATABASE_REPLICA_URL'] = replica_db or None
+    # After a user's write, their reads stay on the primary this long (covers replica lag)
+    app.config['DB_REPLICA_LAG_WINDOW_SECONDS'] = float(os.getenv('DB_REPLICA_LAG_WINDOW_SECONDS', '10'))
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Engine profiles (see app.db_engine)
+    app.config['SQLITE_JOURNAL_MODE'] = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    app.config['SQLITE_SYNCHRONOUS'] = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+    app.config['SQLITE_MMAP_SIZE'] = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+    app.config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', '5'))
+    app.config['DB_MAX_OVERFLOW'] = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+    app.config['DB_POOL_TIMEOUT'] = int(os.getenv('DB_POOL_TIMEOUT', '30'))
+    app.config['DB_POOL_RECYCLE'] = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+    app.config['DB_POOL_PRE_PING'] = os.getenv('DB_POOL_PRE_PING', '1').lower() in ('1', 'true', 'yes')
+    app.config['DB_STATEMENT_TIMEOUT_MS'] = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '30000'))
+    from app.db_engine import REPLICA_BIND, engine_options
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    if app.config['DATABASE_REPLICA_URL']:
+        replica_url = app.config['DATABASE_REPLICA_URL']
+        app.config['SQLALCHEMY_BINDS'] = {REPLICA_BIND: {"url": replica_url, **engine_options(app.config, replica_url)}}
+    # Rendered PDF reports (see app.report_cache and app.report_storage)
+    app.config['REPORT_STORAGE_DIR'] = os.getenv('REPORT_STORAGE_DIR') or os.path.join(app.instance_path, 'reports')
+    app.config['REPORT_STORAGE_COMPRESSION'] = os.getenv('REPORT_STORAGE_COMPRESSION') or None
+    app.config['REPORT_STORAGE_OFFLOAD'] = os.getenv('REPORT_STORAGE_OFFLOAD') or None
+    app.config['REPORT_STORAGE_ACCEL_PREFIX'] = os.getenv('REPORT_STORAGE_ACCEL_PREFIX', '/protected-reports/')
+    app.config['REPORT_STORAGE_OFFLOAD_MIN_BYTES'] = int(os.getenv('REPORT_STORAGE_OFFLOAD_MIN_BYTES', '0'))
+    app.config['REPORT_CACHE_MAX_BYTES'] = int(os.getenv('REPORT_CACHE_MAX_MB', '256')) * 1024 * 1024
+    # Keyset pagination of list endpoints (see app.pagination)
+    app.config['PAGE_SIZE_DEFAULT'] = int(os.getenv('PAGE_SIZE_DEFAULT', '50'))
+    app.config['PAGE_SIZE_MAX'] = int(os.getenv('PAGE_SIZE_MAX', '200'))
+    # Server-Sent Events (see app.events): auto uses LISTEN/NOTIFY on PostgreSQL
+    app.config['EVENTS_TRANSPORT'] = os.getenv('EVENTS_TRANSPORT', 'auto').lower()
+    app.config['EVENT_RETENTION_HOURS'] = int(os.getenv('EVENT_RETENTION_HOURS', '24'))
+    app.config['SSE_MAX_STREAM_SECONDS'] = float(os.getenv('SSE_MAX_STREAM_SECONDS', '300'))
+    app.config['SSE_KEEPALIVE_SECONDS'] = float(os.getenv('SSE_KEEPALIVE_SECONDS', '15'))
+    # Per-request SQL query budget (see app.query_budget)
+    app.config['QUERY_BUDGET_DEFAULT'] = int(os.getenv('QUERY_BUDGET_DEFAULT', '30'))
+    app.config['QUERY_BUDGET_STRICT'] = os.getenv('QUERY_BUDGET_STRICT', '0').lower() in ('1', 'true', 'yes')
+    app.config['QUERY_COUNT_HEADER'] = os.getenv('QUERY_COUNT_HEADER', '0').lower() in ('1', 'true', 'yes')
 
     # Initialize extensions
     db.init_app(app)
     migrate.init_app(app, db)
 
+    from app import db_engine
+    db_engine.init_app(app, db)
+
+    from app import query_budget
+    query_budget.init_app(app)
+
+    from app import events
+    events.init_app(app)
+
+    from app import directory
+    directory.init_app(app)
+
     # Import models to ensure they are registered with SQLAlchemy
     from app import models
 
@@ -49,4 +105,10 @@ def create_app():
     from app.routes import main as main_blueprint
     app.register_blueprint(main_blueprint)
 
+    from app.bulk_score import score_file_command
+    app.cli.add_command(score_file_command)
+
+    from app.trends import rebuild_trends_command
+    app.cli.add_command(rebuild_trends_command)
+
     return app
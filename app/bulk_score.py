@@ -0,0 +1,227 @@
+"""
+Offline bulk scoring of CSV / NDJSON files through the risk models.
+
+    python -m app.bulk_score screening.csv --disease heart --output scored.csv
+    flask score-file screening.ndjson --disease diabetes --insert --user-id 7
+
+Input rows are read in chunks and scored across a process pool, with a
+bounded number of chunks in flight, so memory stays constant regardless of
+file size. Columns may be named after the Result fields (`age`, `trestbps`,
+...) or the report labels (`Resting blood pressure (trestbps)`); any other
+columns are copied to the output unchanged.
+"""
+import csv
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+import click
+from flask import has_app_context
+from flask.cli import ScriptInfo
+
+DISEASE_ALIASES = {
+    "heart": "Heart Disease",
+    "heart disease": "Heart Disease",
+    "diabetes": "Diabetes",
+}
+
+OUTPUT_FIELDS = ["prediction", "prediction_text", "probability", "risk_level", "model_version", "error"]
+
+
+def _resolve_disease(value):
+    disease = DISEASE_ALIASES.get((value or "").strip().lower())
+    if not disease:
+        raise ValueError(f"unknown disease {value!r}; use heart or diabetes")
+    return disease
+
+
+def _read_rows(path, fmt):
+    """Yield dict rows from a CSV or NDJSON file without loading it whole."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "ndjson":
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _score_chunk(disease, rows):
+    """Worker entry point: score one chunk, returning one output dict per input row."""
+    from app.services import BATCH_MODELS, coerce_feature_row, get_preventive_measures
+
+    features, score_batch, positive_text, negative_text = BATCH_MODELS[disease]
+    aliases = {}
+    for name, _, label in features:
+        aliases[name.lower()] = name
+        aliases[label.lower()] = name
+
+    out = [dict(row) for row in rows]
+    valid, data = [], []
+    for i, row in enumerate(rows):
+        normalized = {aliases.get(str(k).strip().lower(), k): v for k, v in row.items()}
+        try:
+            data.append(coerce_feature_row(features, normalized))
+            valid.append(i)
+        except ValueError as e:
+            out[i]["error"] = str(e)
+
+    labels, probabilities, model_version = score_batch(data, use_cache=False) if data else ([], [], None)
+    if labels is None:
+        raise RuntimeError(f"{disease} model not loaded")
+    for i, values, label, probability in zip(valid, data, labels, probabilities):
+        out[i].update({
+            "prediction": label,
+            "prediction_text": positive_text if label == 1 else negative_text,
+            "probability": round(probability * 100, 2),
+            "risk_level": get_preventive_measures(disease, probability)["risk_level"],
+            "model_version": model_version,
+            "_features": dict(zip([name for name, _, _ in features], values)),
+        })
+    return out
+
+
+class _Writer:
+    def __init__(self, path, fmt):
+        self.fmt = fmt
+        self.file = sys.stdout if path in (None, "-") else open(path, "w", newline="", encoding="utf-8")
+        self.csv = None
+
+    def write(self, rows):
+        for row in rows:
+            row = {k: v for k, v in row.items() if k != "_features"}
+            if self.fmt == "ndjson":
+                self.file.write(json.dumps(row) + "\n")
+                continue
+            if self.csv is None:
+                fields = [k for k in row if k not in OUTPUT_FIELDS] + OUTPUT_FIELDS
+                self.csv = csv.DictWriter(self.file, fieldnames=fields, extrasaction="ignore")
+                self.csv.writeheader()
+            self.csv.writerow(row)
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+def _insert_results(disease, user_id, rows):
+    """Insert the scored rows of one chunk as Result records in a single transaction."""
+    from app import db
+    from app.models import Result
+    from app.trends import record_results
+
+    now = datetime.utcnow()
+    records = [
+        dict(
+            row["_features"],
+            user_id=user_id,
+            disease=disease,
+            disease_selected=disease,
+            prediction=row["prediction_text"],
+            probability=row["probability"],
+            model_version=row["model_version"],
+            timestamp=now,
+        )
+        for row in rows
+        if "_features" in row
+    ]
+    if records:
+        db.session.execute(Result.__table__.insert(), records)
+        record_results(db.session, records)
+        db.session.commit()
+    return len(records)
+
+
+def score_file(input_path, disease, output=None, fmt=None, output_format=None,
+               chunk_size=1000, workers=None, insert=False, user_id=None):
+    """
+    Stream `input_path` through the model for `disease`. Returns a stats dict.
+    With insert=True the scored rows are stored as Result rows for `user_id`
+    (requires an application context).
+    """
+    disease = _resolve_disease(disease)
+    fmt = fmt or ("ndjson" if input_path.endswith((".ndjson", ".jsonl")) else "csv")
+    if output_format is None:
+        output_format = "ndjson" if output and output.endswith((".ndjson", ".jsonl")) else "csv"
+    if insert and not user_id:
+        raise ValueError("--insert requires --user-id")
+
+    workers = workers or os.cpu_count() or 1
+    stats = {"rows": 0, "scored": 0, "errors": 0, "inserted": 0}
+    writer = _Writer(output, output_format) if (output or not insert) else None
+
+    def drain(fut):
+        rows = fut.result()
+        stats["rows"] += len(rows)
+        stats["scored"] += sum(1 for r in rows if "_features" in r)
+        stats["errors"] += sum(1 for r in rows if r.get("error"))
+        if writer:
+            writer.write(rows)
+        if insert:
+            stats["inserted"] += _insert_results(disease, user_id, rows)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for chunk in _chunks(_read_rows(input_path, fmt), chunk_size):
+                pending.append(pool.submit(_score_chunk, disease, chunk))
+                # Bound in-flight chunks so memory does not grow with the file.
+                if len(pending) >= workers * 2:
+                    drain(pending.popleft())
+            while pending:
+                drain(pending.popleft())
+    finally:
+        if writer:
+            writer.close()
+    return stats
+
+
+@click.command("score-file")
+@click.argument("input_path", metavar="INPUT")
+@click.option("--disease", required=True, help="heart or diabetes")
+@click.option("--output", "-o", help="Output file (default: stdout unless --insert).")
+@click.option("--format", "fmt", type=click.Choice(["csv", "ndjson"]), help="Input format (default: from extension).")
+@click.option("--output-format", type=click.Choice(["csv", "ndjson"]), help="Output format (default: from extension).")
+@click.option("--chunk-size", type=int, default=1000, show_default=True)
+@click.option("--workers", type=int, default=None, help="Scoring processes (default: CPU count).")
+@click.option("--insert", is_flag=True, help="Store scored rows as Result records.")
+@click.option("--user-id", type=int, help="Owner of inserted Result rows.")
+def score_file_command(input_path, disease, output, fmt, output_format, chunk_size, workers, insert, user_id):
+    """Score a CSV/NDJSON file through the risk models."""
+    kwargs = dict(output=output, fmt=fmt, output_format=output_format, chunk_size=chunk_size,
+                  workers=workers, insert=insert, user_id=user_id)
+    try:
+        if insert and not has_app_context():
+            info = click.get_current_context().find_object(ScriptInfo)
+            app = info.load_app() if info else _create_app()
+            with app.app_context():
+                stats = score_file(input_path, disease, **kwargs)
+        else:
+            stats = score_file(input_path, disease, **kwargs)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    click.echo(json.dumps(stats), err=True)
+
+
+def _create_app():
+    from app import create_app
+
+    return create_app()
+
+
+if __name__ == "__main__":
+    score_file_command(prog_name="python -m app.bulk_score")
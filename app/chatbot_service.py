@@ -1,31 +1,34 @@
 import os
-try:
-    from google import genai
-    from google.genai import types
-except Exception:  # pragma: no cover
-    genai = None
 from app.models import Result, User
 from app import db
+from app.services import _import_genai
 from datetime import datetime
 
+_UNSET = object()
+
 class HealthcareChatbot:
     def __init__(self):
         # Support both naming conventions for the API key
         self.api_key = os.getenv('GEMINI_API_KEY') or os.getenv('GOOGLE_API_KEY')
-        if genai and self.api_key:
-            try:
-                self.client = genai.Client(api_key=self.api_key)
-            except Exception as e:
-                print(f"Error initializing Chatbot Gemini Client: {e}")
-                self.client = None
-        else:
-            if not genai:
+        # google-genai is slow to import, so the client is created on first use.
+        self._client = _UNSET
+
+    @property
+    def client(self):
+        if self._client is _UNSET:
+            genai, _ = _import_genai()
+            self._client = None
+            if genai and self.api_key:
+                try:
+                    self._client = genai.Client(api_key=self.api_key)
+                except Exception as e:
+                    print(f"Error initializing Chatbot Gemini Client: {e}")
+            elif not genai:
                 print("Warning: google-genai not installed; chatbot AI disabled.")
             else:
                 # Only show warning if BOTH are missing
-                if not os.getenv('GEMINI_API_KEY') and not os.getenv('GOOGLE_API_KEY'):
-                    print("Warning: Neither GEMINI_API_KEY nor GOOGLE_API_KEY found.")
-            self.client = None
+                print("Warning: Neither GEMINI_API_KEY nor GOOGLE_API_KEY found.")
+        return self._client
 
     def get_conversation_context(self, user_id):
         """Retrieve relevant medical context for the user."""
@@ -132,6 +135,7 @@ class HealthcareChatbot:
         """
         
         try:
+            _, types = _import_genai()
             response = self.client.models.generate_content(
                 model='gemini-1.5-flash',
                 contents=message,
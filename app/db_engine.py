@@ -0,0 +1,111 @@
+"""
+Backend-specific engine profiles.
+
+SQLite (the default database) is tuned with pragmas applied to every new
+connection:
+
+* journal_mode=WAL lets readers proceed while one writer commits, instead
+  of the rollback journal's whole-file lock that makes concurrent gunicorn
+  workers fail with "database is locked";
+* synchronous=NORMAL only fsyncs at checkpoints, which is still durable
+  against application crashes in WAL mode;
+* busy_timeout makes a writer wait for the lock instead of failing;
+* mmap_size serves reads from a memory map instead of read() calls.
+
+PostgreSQL gets an explicitly sized connection pool with pre-ping (dropped
+connections are replaced instead of failing the request), recycling, and a
+server-side statement_timeout so a runaway query cannot hold a worker.
+
+Everything comes from SQLITE_* / DB_* settings in the app config, and
+applies to the read replica (see app.replica) as well as the primary.
+
+RoutingSession is the session class of app.db: it sends the reads of
+@read_only views to the replica bind.
+"""
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+REPLICA_BIND = "replica"
+
+_UPSERT_INSERTS = {}
+
+
+def engine_options(config, uri=None):
+    """Engine options for `uri` (by default the configured database URI)."""
+    uri = uri or config["SQLALCHEMY_DATABASE_URI"]
+    if uri.startswith("postgresql"):
+        options = {
+            "pool_size": config["DB_POOL_SIZE"],
+            "max_overflow": config["DB_MAX_OVERFLOW"],
+            "pool_timeout": config["DB_POOL_TIMEOUT"],
+            "pool_recycle": config["DB_POOL_RECYCLE"],
+            "pool_pre_ping": config["DB_POOL_PRE_PING"],
+        }
+        if config["DB_STATEMENT_TIMEOUT_MS"]:
+            options["connect_args"] = {"options": f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"}
+        return options
+    if uri.startswith("sqlite"):
+        # The driver's own lock wait; busy_timeout below takes over once connected.
+        return {"connect_args": {"timeout": config["SQLITE_BUSY_TIMEOUT_MS"] / 1000}}
+    return {}
+
+
+def upsert_insert(dialect_name):
+    """The dialect's insert() construct, which supports on_conflict_do_update/do_nothing."""
+    if not _UPSERT_INSERTS:
+        from sqlalchemy.dialects import postgresql, sqlite
+
+        _UPSERT_INSERTS.update(sqlite=sqlite.insert, postgresql=postgresql.insert)
+    try:
+        return _UPSERT_INSERTS[dialect_name]
+    except KeyError:
+        raise RuntimeError(f"INSERT ... ON CONFLICT is not supported for {dialect_name}")
+
+
+class RoutingSession(Session):
+    """
+    Reads go to the replica bind while session.info["use_replica"] is set;
+    flushes and INSERT/UPDATE/DELETE statements always go to the primary and
+    set session.info["wrote"] for the transaction, whose later reads then
+    stay on the primary too.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or getattr(clause, "is_dml", False):
+                self.info["wrote"] = True
+            elif self.info.get("use_replica") and not self.info.get("wrote"):
+                replica = self._db.engines.get(REPLICA_BIND)
+                if replica is not None:
+                    return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def sqlite_pragmas(config):
+    pragmas = {
+        "journal_mode": config["SQLITE_JOURNAL_MODE"],
+        "synchronous": config["SQLITE_SYNCHRONOUS"],
+        "busy_timeout": config["SQLITE_BUSY_TIMEOUT_MS"],
+        "mmap_size": config["SQLITE_MMAP_SIZE"],
+    }
+    return {name: value for name, value in pragmas.items() if value not in (None, "")}
+
+
+def init_app(app, db):
+    """Apply the SQLite pragmas to every connection of the app's engines."""
+    with app.app_context():
+        engines = [engine for engine in db.engines.values() if engine.dialect.name == "sqlite"]
+    if not engines:
+        return
+    pragmas = sqlite_pragmas(app.config)
+
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    for engine in engines:
+        event.listen(engine, "connect", _set_sqlite_pragmas)
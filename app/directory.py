@@ -0,0 +1,192 @@
+"""
+Per-worker snapshot of the doctor directory.
+
+The directory changes rarely (registrations, profile edits) but /doctors and
+/api/doctors/ read it on every hit. Each worker keeps an immutable snapshot
+of it in memory, tagged with the directory version:
+
+* DirectoryVersion holds one counter row. Inserts, updates and deletes of
+  DoctorProfile and Doctor rows (and updates of doctor accounts) are picked
+  up by mapper events, and an after_flush listener bumps the counter once per
+  flush, in the transaction that made the change. Bulk Core writes to those
+  tables must call bump_version() themselves;
+* a request reads the counter (a primary-key lookup) and uses the worker's
+  snapshot if it is that version, otherwise rebuilds it first. The version is
+  read before the rows, so a snapshot is never tagged newer than its data;
+* the version is also the ETag of directory responses, so a client or proxy
+  revalidating an unchanged directory gets a 304 without a page being built.
+
+Pages are served from the snapshot with the same (created_at, id) keyset
+cursors as app.pagination, so cursors stay valid across a rebuild.
+"""
+import threading
+from bisect import bisect_right
+from collections import namedtuple
+
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+
+from app import db
+from app.db_engine import upsert_insert
+from app.models import Doctor, DirectoryVersion, DoctorProfile, User
+from app.pagination import decode_cursor, encode_cursor
+
+VERSION_ROW_ID = 1
+
+DirectoryEntry = namedtuple("DirectoryEntry", [
+    "profile_id", "created_at", "user_id", "username", "specialization", "experience_years", "hospital",
+    "contact_number", "is_verified",
+])
+LegacyEntry = namedtuple("LegacyEntry", ["name", "specialization", "experience", "hospital", "contact"])
+
+
+class DirectorySnapshot:
+    """The directory at one version. Never modified once built."""
+
+    def __init__(self, version, profiles, legacy):
+        self.version = version
+        self.profiles = tuple(profiles)  # ordered by (created_at, profile_id)
+        self.verified = tuple(p for p in self.profiles if p.is_verified)
+        self.legacy = tuple(legacy)  # only loaded when there are no profiles
+        self._keys = [(p.created_at, p.profile_id) for p in self.profiles]
+        self._verified_keys = [(p.created_at, p.profile_id) for p in self.verified]
+
+    def page(self, cursor=None, limit=50, verified_only=False):
+        """(entries, next_cursor) for one page in created_at order, like keyset_page()."""
+        entries, keys = (self.verified, self._verified_keys) if verified_only else (self.profiles, self._keys)
+        start = bisect_right(keys, decode_cursor(cursor)) if cursor else 0
+        rows = entries[start:start + limit]
+        if start + limit >= len(entries):
+            return rows, None
+        return rows, encode_cursor(rows[-1].created_at, rows[-1].profile_id)
+
+
+class DirectoryCache:
+    def __init__(self):
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def snapshot(self, version):
+        """The snapshot for `version`, rebuilt from the database if this worker's is older."""
+        current = self._snapshot
+        if current is not None and current.version >= version:
+            return current
+        with self._lock:
+            current = self._snapshot
+            if current is None or current.version < version:
+                current = self._snapshot = _load(version)
+        return current
+
+
+def _load(version):
+    rows = (
+        db.session.query(DoctorProfile, User.username)
+        .join(User, DoctorProfile.user_id == User.id)
+        .filter(User.role == 'doctor')
+        .order_by(DoctorProfile.created_at, DoctorProfile.id)
+        .all()
+    )
+    profiles = [
+        DirectoryEntry(p.id, p.created_at, p.user_id, username, p.specialization, p.experience_years, p.hospital,
+                       p.contact_number, p.is_verified)
+        for p, username in rows
+    ]
+    legacy = []
+    if not profiles:
+        legacy = [LegacyEntry(d.name, d.specialization, d.experience, d.hospital, d.contact)
+                  for d in Doctor.query.order_by(Doctor.id).all()]
+    return DirectorySnapshot(version, profiles, legacy)
+
+
+def current_version():
+    version = db.session.execute(
+        db.select(DirectoryVersion.version).where(DirectoryVersion.id == VERSION_ROW_ID)
+    ).scalar()
+    return version or 0
+
+
+def get_snapshot(version=None):
+    """This worker's snapshot at the current (or the given, already read) version."""
+    if version is None:
+        version = current_version()
+    return current_app.extensions["doctor_directory"].snapshot(version)
+
+
+def bump_version(connection):
+    table = DirectoryVersion.__table__
+    stmt = upsert_insert(connection.dialect.name)(table).values(id=VERSION_ROW_ID, version=1)
+    connection.execute(stmt.on_conflict_do_update(index_elements=[table.c.id],
+                                                  set_={"version": table.c.version + 1}))
+
+
+def init_app(app):
+    app.extensions["doctor_directory"] = DirectoryCache()
+
+
+# -- HTTP caching ----------------------------------------------------------------
+
+def etag_for(version, *parts):
+    return "-".join(["directory", str(version), *(str(p) for p in parts)])
+
+
+def not_modified(etag):
+    """True when the request already holds the response tagged `etag`."""
+    return request.if_none_match.contains_weak(etag)
+
+
+def tag_response(response, etag, private=False):
+    """
+    Set the ETag and make caches revalidate on every use: the directory may
+    change at any time, so the 304 is what saves the work.
+    """
+    response.set_etag(etag, weak=True)
+    response.cache_control.no_cache = True
+    if private:
+        response.cache_control.private = True
+        response.vary.add("Cookie")
+    return response
+
+
+# -- change tracking ---------------------------------------------------------------
+
+def _mark_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info["directory_changed"] = True
+
+
+def _mark_updated(mapper, connection, target):
+    # after_update also fires for objects that were dirty without a net change.
+    session = object_session(target)
+    if session is not None and session.is_modified(target, include_collections=False):
+        session.info["directory_changed"] = True
+
+
+for _model in (DoctorProfile, Doctor):
+    event.listen(_model, "after_insert", _mark_changed)
+    event.listen(_model, "after_update", _mark_updated)
+    event.listen(_model, "after_delete", _mark_changed)
+
+
+@event.listens_for(User, "after_update")
+def _mark_doctor_account_updated(mapper, connection, target):
+    if target.role == 'doctor':
+        _mark_updated(mapper, connection, target)
+
+
+@event.listens_for(User, "after_delete")
+def _mark_doctor_account_deleted(mapper, connection, target):
+    if target.role == 'doctor':
+        _mark_changed(mapper, connection, target)
+
+
+@event.listens_for(db.session, "after_flush")
+def _bump_changed_directory(session, flush_context):
+    if session.info.pop("directory_changed", False):
+        bump_version(session.connection())
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_directory_change(session):
+    session.info.pop("directory_changed", None)
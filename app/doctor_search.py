@@ -0,0 +1,254 @@
+"""
+Full-text search over the doctor directory.
+
+`contains()` filters compile to LIKE '%term%', which scans every row. Each
+directory table instead gets a search index:
+
+* SQLite: an FTS5 table (doctor_profile_fts / doctor_fts) whose rowid is the
+  source row's id, ranked with bm25();
+* PostgreSQL: a table of tsvector documents (doctor_profile_search /
+  doctor_search) with a GIN index, ranked with ts_rank().
+
+Names weigh more than specializations, which weigh more than hospitals.
+Every word of the query must match the start of a word in the document
+("card hea" finds "Cardiology, City Heart Institute"), so the same query
+serves type-ahead and the search box.
+
+The indexes are kept in sync by mapper events on DoctorProfile and Doctor,
+in the flush that writes the row, and are created alongside the tables by
+db.create_all() (or the migration). They are not models, so migrations/env.py
+leaves them out of autogenerate (is_index_table()). rebuild() repopulates them from the
+source tables after bulk loads that bypass the ORM; update_schema.py runs
+it when an index is out of step with its table.
+"""
+import re
+
+from sqlalchemy import Float, Integer, event, false, func, select, text
+
+from app import db
+from app.models import Doctor, DoctorProfile, User
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+MAX_TERMS = 8
+FTS5_SHADOW_SUFFIXES = ("_data", "_idx", "_content", "_docsize", "_config")
+
+
+class _SearchIndex:
+    def __init__(self, name, model, columns, weights):
+        self.name = name
+        self.model = model
+        self.columns = columns
+        self.weights = weights  # bm25 weights, highest first: A, B, C for tsvector
+
+    @property
+    def fts_table(self):
+        return f"{self.name}_fts"
+
+    @property
+    def pg_table(self):
+        return f"{self.name}_search"
+
+    # -- DDL -------------------------------------------------------------------
+
+    def create(self, connection):
+        if connection.dialect.name == "sqlite":
+            connection.exec_driver_sql(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.fts_table} USING fts5("
+                f"{', '.join(self.columns)}, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        elif connection.dialect.name == "postgresql":
+            connection.exec_driver_sql(
+                f"CREATE TABLE IF NOT EXISTS {self.pg_table} ("
+                f"id INTEGER PRIMARY KEY REFERENCES {self.model.__tablename__} (id) ON DELETE CASCADE, "
+                f"document TSVECTOR NOT NULL)"
+            )
+            connection.exec_driver_sql(
+                f"CREATE INDEX IF NOT EXISTS ix_{self.pg_table}_document ON {self.pg_table} USING GIN (document)"
+            )
+
+    def drop(self, connection):
+        if connection.dialect.name == "sqlite":
+            connection.exec_driver_sql(f"DROP TABLE IF EXISTS {self.fts_table}")
+        elif connection.dialect.name == "postgresql":
+            connection.exec_driver_sql(f"DROP TABLE IF EXISTS {self.pg_table}")
+
+    def _pg_document(self):
+        return " || ".join(
+            f"setweight(to_tsvector('simple', coalesce(:{column}, '')), '{weight}')"
+            for column, weight in zip(self.columns, "ABC")
+        )
+
+    # -- sync --------------------------------------------------------------------
+
+    def upsert(self, connection, rows):
+        """Index `rows`: dicts with "id" and one key per indexed column."""
+        if not rows:
+            return
+        if connection.dialect.name == "sqlite":
+            connection.execute(text(f"DELETE FROM {self.fts_table} WHERE rowid = :id"), rows)
+            connection.execute(text(
+                f"INSERT INTO {self.fts_table} (rowid, {', '.join(self.columns)}) "
+                f"VALUES (:id, {', '.join(':' + c for c in self.columns)})"
+            ), rows)
+        elif connection.dialect.name == "postgresql":
+            connection.execute(text(
+                f"INSERT INTO {self.pg_table} (id, document) VALUES (:id, {self._pg_document()}) "
+                f"ON CONFLICT (id) DO UPDATE SET document = EXCLUDED.document"
+            ), rows)
+
+    def delete(self, connection, row_id):
+        if connection.dialect.name == "sqlite":
+            connection.execute(text(f"DELETE FROM {self.fts_table} WHERE rowid = :id"), {"id": row_id})
+        elif connection.dialect.name == "postgresql":
+            connection.execute(text(f"DELETE FROM {self.pg_table} WHERE id = :id"), {"id": row_id})
+
+    def table_for(self, dialect_name):
+        return self.fts_table if dialect_name == "sqlite" else self.pg_table
+
+    def owns_table(self, name):
+        """True for this index's tables, including the shadow tables FTS5 creates."""
+        return name in (self.fts_table, self.pg_table) or name in (
+            self.fts_table + suffix for suffix in FTS5_SHADOW_SUFFIXES)
+
+    # -- querying ----------------------------------------------------------------
+
+    def matches(self, dialect_name, terms):
+        """
+        Selectable of (id, score) for rows matching every term as a word
+        prefix; lower scores rank higher. None if the backend has no index.
+        """
+        if dialect_name == "sqlite":
+            match = " AND ".join('"' + t.replace('"', '""') + '"*' for t in terms)
+            weights = ", ".join(str(w) for w in self.weights)
+            stmt = text(
+                f"SELECT rowid AS id, bm25({self.fts_table}, {weights}) AS score "
+                f"FROM {self.fts_table} WHERE {self.fts_table} MATCH :match"
+            ).bindparams(match=match)
+        elif dialect_name == "postgresql":
+            tsquery = " & ".join(f"{t}:*" for t in terms)
+            stmt = text(
+                f"SELECT id, -ts_rank('{{0.1, 0.2, 0.4, 1.0}}', document, query) AS score "
+                f"FROM {self.pg_table}, to_tsquery('simple', :tsquery) AS query WHERE document @@ query"
+            ).bindparams(tsquery=tsquery)
+        else:
+            return None
+        return stmt.columns(id=Integer, score=Float).subquery(f"{self.name}_match")
+
+
+PROFILE_INDEX = _SearchIndex("doctor_profile", DoctorProfile, ["username", "specialization", "hospital"],
+                             weights=(4.0, 2.0, 1.0))
+LEGACY_INDEX = _SearchIndex("doctor", Doctor, ["name", "specialization", "hospital"], weights=(4.0, 2.0, 1.0))
+INDEXES = (PROFILE_INDEX, LEGACY_INDEX)
+
+
+def is_index_table(name):
+    return any(index.owns_table(name) for index in INDEXES)
+
+
+def search_terms(search):
+    """Lower-cased words of a search string (at most MAX_TERMS)."""
+    return [word.lower() for word in WORD_RE.findall(search or "")][:MAX_TERMS]
+
+
+def search_profiles(query, search):
+    """
+    Restrict a query over DoctorProfile (joined with User) to profiles matching
+    `search`, best matches first.
+    """
+    terms = search_terms(search)
+    if not terms:
+        return query.filter(false())
+    matches = PROFILE_INDEX.matches(db.engine.dialect.name, terms)
+    if matches is None:
+        return query.filter(User.username.contains(search) | DoctorProfile.specialization.contains(search)
+                            | DoctorProfile.hospital.contains(search))
+    return query.join(matches, matches.c.id == DoctorProfile.id).order_by(matches.c.score, DoctorProfile.id)
+
+
+def search_legacy(query, search):
+    terms = search_terms(search)
+    if not terms:
+        return query.filter(false())
+    matches = LEGACY_INDEX.matches(db.engine.dialect.name, terms)
+    if matches is None:
+        return query.filter(Doctor.name.contains(search) | Doctor.specialization.contains(search))
+    return query.join(matches, matches.c.id == Doctor.id).order_by(matches.c.score, Doctor.id)
+
+
+# -- keeping the indexes in sync ---------------------------------------------------
+
+def _profile_row(connection, profile):
+    username = connection.execute(select(User.username).where(User.id == profile.user_id)).scalar()
+    return {"id": profile.id, "username": username, "specialization": profile.specialization,
+            "hospital": profile.hospital}
+
+
+@event.listens_for(DoctorProfile, "after_insert")
+@event.listens_for(DoctorProfile, "after_update")
+def _index_profile(mapper, connection, target):
+    PROFILE_INDEX.upsert(connection, [_profile_row(connection, target)])
+
+
+@event.listens_for(DoctorProfile, "after_delete")
+def _unindex_profile(mapper, connection, target):
+    PROFILE_INDEX.delete(connection, target.id)
+
+
+@event.listens_for(Doctor, "after_insert")
+@event.listens_for(Doctor, "after_update")
+def _index_doctor(mapper, connection, target):
+    LEGACY_INDEX.upsert(connection, [{"id": target.id, "name": target.name,
+                                      "specialization": target.specialization, "hospital": target.hospital}])
+
+
+@event.listens_for(Doctor, "after_delete")
+def _unindex_doctor(mapper, connection, target):
+    LEGACY_INDEX.delete(connection, target.id)
+
+
+@event.listens_for(db.metadata, "after_create")
+def _create_indexes(metadata, connection, **kw):
+    for index in INDEXES:
+        index.create(connection)
+
+
+@event.listens_for(db.metadata, "before_drop")
+def _drop_indexes(metadata, connection, **kw):
+    for index in INDEXES:
+        index.drop(connection)
+
+
+def rebuild(connection, batch_size=5000):
+    """Repopulate both indexes from their source tables. Returns the number of rows indexed."""
+    if connection.dialect.name not in ("sqlite", "postgresql"):
+        return 0
+    sources = [
+        (PROFILE_INDEX, select(DoctorProfile.id, User.username, DoctorProfile.specialization, DoctorProfile.hospital)
+         .join(User, DoctorProfile.user_id == User.id)),
+        (LEGACY_INDEX, select(Doctor.id, Doctor.name, Doctor.specialization, Doctor.hospital)),
+    ]
+    total = 0
+    for index, source in sources:
+        index.create(connection)
+        connection.exec_driver_sql(f"DELETE FROM {index.table_for(connection.dialect.name)}")
+        rows = connection.execute(source).mappings().all()
+        for start in range(0, len(rows), batch_size):
+            index.upsert(connection, [dict(r) for r in rows[start:start + batch_size]])
+        total += len(rows)
+    if connection.dialect.name == "sqlite":
+        for index in INDEXES:
+            connection.exec_driver_sql(f"INSERT INTO {index.fts_table} ({index.fts_table}) VALUES ('optimize')")
+    return total
+
+
+def is_stale(connection):
+    """True when an index is missing rows from (or has rows beyond) its source table."""
+    if connection.dialect.name not in ("sqlite", "postgresql"):
+        return False
+    for index in INDEXES:
+        source = connection.execute(select(func.count()).select_from(index.model)).scalar()
+        indexed = connection.exec_driver_sql(
+            f"SELECT COUNT(*) FROM {index.table_for(connection.dialect.name)}").scalar()
+        if indexed != source:
+            return True
+    return False
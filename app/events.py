@@ -0,0 +1,363 @@
+"""
+Per-user event stream (Server-Sent Events) for notifications and review
+request status changes.
+
+Events are written to the user_event table (UserEvent) in the same
+transaction as the change they describe, and delivered to connected streams
+only once that transaction commits. emit_many() queues them in session.info
+and a before_commit listener writes all of the transaction's events at once:
+
+* LocalBroker (SQLite, tests, single process) keeps the events of a
+  transaction in session.info and publishes them to in-process subscribers
+  from an after_commit listener, like app.render_queue does for renders;
+* PostgresBroker issues pg_notify() inside the transaction (PostgreSQL
+  delivers it on commit, and drops it on rollback). Every worker LISTENs on
+  the channel from a background thread and hands the events to its own
+  subscribers, so a stream sees events written by any worker.
+
+Each user's events are numbered by a per-user sequence (UserEvent.seq), and
+that number is the SSE event id. Table ids come from a shared sequence and
+can commit out of order; seq cannot. It is taken from the user's
+UserEventSequence row, which stays locked until the transaction commits, so
+event n + 1 can only commit after event n, and a stream sends every user
+event in seq order without gaps. When a live event arrives ahead of its
+predecessor (the notification or after_commit hook of an earlier commit is
+still in flight), the stream first sends the missing ones from the table.
+
+Writing the events at commit time means a transaction locks all of its
+users' sequence rows in one statement, in user_id order. Separate emit_many()
+calls would each lock rows as they went (e.g. the doctor's and then the
+patient's in one transaction, the reverse in another) and could deadlock.
+
+A reconnecting EventSource sends the last seq back as Last-Event-ID, and the
+stream replays newer rows from the table before switching to live events.
+Events older than EVENT_RETENTION_HOURS are pruned as new ones are written.
+"""
+import json
+import logging
+import queue
+import select
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event, text
+
+from app import db
+from app.db_engine import upsert_insert
+from app.models import UserEvent, UserEventSequence
+from app.threads import ProcessThreads
+
+CHANNEL = "user_events"
+# pg_notify payloads must stay under 8000 bytes; larger events are loaded by id.
+NOTIFY_PAYLOAD_LIMIT = 7900
+REPLAY_BATCH = 500
+SEQ_BATCH = 1000
+RECONNECT_DELAY_MS = 3000
+PRUNE_INTERVAL = 300.0
+
+logger = logging.getLogger(__name__)
+
+_prune_lock = threading.Lock()
+_last_prune = 0.0
+
+
+# -- writing events ------------------------------------------------------------
+
+def emit(user_id, kind, data):
+    emit_many([(user_id, kind, data)])
+
+
+def emit_many(items):
+    """
+    Queue events for (user_id, kind, data) tuples in the current transaction.
+    They are written when it commits and reach connected streams once it has.
+    """
+    now = datetime.utcnow()
+    rows = [{"user_id": user_id, "kind": kind, "payload": json.dumps(data, default=str), "created_at": now}
+            for user_id, kind, data in items]
+    if rows:
+        session = db.session()
+        if not session.in_transaction():
+            # Begin one so a rollback discards the events even if nothing else ran.
+            session.begin()
+        session.info.setdefault("unwritten_events", []).extend(rows)
+
+
+@event.listens_for(db.session, "before_commit")
+def _write_events(session):
+    rows = session.info.pop("unwritten_events", None)
+    if not rows:
+        return
+    counts = Counter(r["user_id"] for r in rows)
+    next_seq = {user_id: last_seq - counts[user_id] for user_id, last_seq in _reserve_seqs(session, counts).items()}
+    for r in rows:
+        next_seq[r["user_id"]] += 1
+        r["seq"] = next_seq[r["user_id"]]
+    table = UserEvent.__table__
+    ids = session.execute(table.insert().returning(table.c.id, sort_by_parameter_order=True), rows).scalars()
+    events = [{"id": event_id, "seq": r["seq"], "user_id": r["user_id"], "kind": r["kind"], "payload": r["payload"]}
+              for event_id, r in zip(ids, rows)]
+    current_app.extensions["event_broker"].stage(session, events)
+    _maybe_prune(session, rows[0]["created_at"])
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def _discard_unwritten_events(session, previous_transaction):
+    # after_rollback only fires once a connection was used; this fires on any
+    # rollback of the whole transaction.
+    if previous_transaction.parent is None:
+        session.info.pop("unwritten_events", None)
+
+
+def _reserve_seqs(session, counts):
+    """
+    Advance each user's sequence by their number of new events and return the
+    new last_seq per user. The upsert keeps the sequence rows locked until
+    commit. This is the transaction's only reservation, and it takes the rows
+    in user_id order, so two transactions cannot deadlock on them.
+    """
+    table = UserEventSequence.__table__
+    insert = upsert_insert(session.get_bind().dialect.name)
+    items = sorted(counts.items())
+    last_seqs = {}
+    for start in range(0, len(items), SEQ_BATCH):
+        stmt = insert(table).values([{"user_id": u, "last_seq": n} for u, n in items[start:start + SEQ_BATCH]])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={"last_seq": table.c.last_seq + stmt.excluded.last_seq},
+        ).returning(table.c.user_id, table.c.last_seq)
+        last_seqs.update(session.execute(stmt).tuples().all())
+    return last_seqs
+
+
+def _maybe_prune(session, now):
+    global _last_prune
+    with _prune_lock:
+        if time.monotonic() - _last_prune < PRUNE_INTERVAL:
+            return
+        _last_prune = time.monotonic()
+    cutoff = now - timedelta(hours=current_app.config["EVENT_RETENTION_HOURS"])
+    session.execute(UserEvent.__table__.delete().where(UserEvent.created_at < cutoff))
+
+
+# -- brokers -------------------------------------------------------------------
+
+class Subscription:
+    def __init__(self, user_id, maxsize):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize)
+        # Set when events may have been missed; the stream then ends and the
+        # client's reconnect replays them from the table.
+        self.lost = False
+
+
+class LocalBroker:
+    def __init__(self, queue_size=256):
+        self.queue_size = queue_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        sub = Subscription(user_id, self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subscribers.get(sub.user_id)
+            if subs:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.user_id]
+
+    def publish(self, events):
+        with self._lock:
+            targets = [(e, list(self._subscribers.get(e["user_id"], ()))) for e in events]
+        for e, subs in targets:
+            for sub in subs:
+                try:
+                    sub.queue.put_nowait(e)
+                except queue.Full:
+                    sub.lost = True
+
+    def drop_all(self):
+        with self._lock:
+            subs = [sub for group in self._subscribers.values() for sub in group]
+        for sub in subs:
+            sub.lost = True
+
+    def stage(self, session, events):
+        session.info.setdefault("pending_events", []).extend(events)
+
+
+class PostgresBroker(LocalBroker):
+    def __init__(self, engine, queue_size=256):
+        super().__init__(queue_size)
+        self.engine = engine
+        self._listener = ProcessThreads(self._listen, name="event-listener")
+
+    def stage(self, session, events):
+        payloads = []
+        for e in events:
+            payload = json.dumps(e, separators=(",", ":"))
+            if len(payload.encode()) > NOTIFY_PAYLOAD_LIMIT:
+                payload = json.dumps(dict(e, payload=None), separators=(",", ":"))
+            payloads.append(payload)
+        session.execute(
+            text("SELECT pg_notify(:channel, p) FROM unnest(CAST(:payloads AS text[])) AS p"),
+            {"channel": CHANNEL, "payloads": payloads},
+        )
+
+    def subscribe(self, user_id):
+        self._listener.ensure()
+        return super().subscribe(user_id)
+
+    def _listen(self):
+        delay = 0.5
+        while True:
+            conn = None
+            try:
+                conn = self.engine.raw_connection()
+                conn.detach()
+                dbapi = conn.dbapi_connection
+                dbapi.autocommit = True
+                with dbapi.cursor() as cur:
+                    cur.execute(f"LISTEN {CHANNEL}")
+                delay = 0.5
+                while True:
+                    if select.select([dbapi], [], [], 30.0)[0]:
+                        dbapi.poll()
+                        events = [json.loads(n.payload) for n in dbapi.notifies]
+                        dbapi.notifies.clear()
+                        self.publish(events)
+            except Exception:
+                logger.exception("Event listener connection failed; reconnecting")
+                # Notifications sent while disconnected are gone; make streams replay.
+                self.drop_all()
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            time.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+
+def init_app(app):
+    transport = app.config["EVENTS_TRANSPORT"]
+    with app.app_context():
+        engine = db.engine
+    if transport == "postgres" or (transport == "auto" and engine.dialect.name == "postgresql"):
+        broker = PostgresBroker(engine)
+    else:
+        broker = LocalBroker()
+    app.extensions["event_broker"] = broker
+    return broker
+
+
+@event.listens_for(db.session, "after_commit")
+def _publish_committed_events(session):
+    events = session.info.pop("pending_events", None)
+    if events:
+        current_app.extensions["event_broker"].publish(events)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_rolled_back_events(session):
+    session.info.pop("pending_events", None)
+
+
+# -- streaming -----------------------------------------------------------------
+
+def _format(e):
+    return f"id: {e['seq']}\nevent: {e['kind']}\ndata: {e['payload']}\n\n"
+
+
+def _as_event(row):
+    return {"id": row.id, "seq": row.seq, "user_id": row.user_id, "kind": row.kind, "payload": row.payload}
+
+
+def _committed_after(user_id, seq):
+    """The user's events after `seq` from the table, in seq order."""
+    while True:
+        rows = (
+            UserEvent.query
+            .filter(UserEvent.user_id == user_id, UserEvent.seq > seq)
+            .order_by(UserEvent.seq)
+            .limit(REPLAY_BATCH)
+            .all()
+        )
+        for row in rows:
+            yield _as_event(row)
+            seq = row.seq
+        if len(rows) < REPLAY_BATCH:
+            # Do not hold a pooled connection while idle.
+            db.session.close()
+            return
+
+
+def _last_seq(user_id):
+    last_seq = db.session.execute(
+        db.select(UserEventSequence.last_seq).where(UserEventSequence.user_id == user_id)
+    ).scalar()
+    return last_seq or 0
+
+
+def event_stream(user_id, last_event_id=None, max_seconds=300.0, keepalive=15.0):
+    """
+    Yield the SSE stream for `user_id`: events after `last_event_id` from the
+    table, then live events until `max_seconds` have passed (the client then
+    reconnects). Must run inside the request's app context.
+    """
+    broker = current_app.extensions["event_broker"]
+    # Subscribe before reading the position or replaying, so nothing committed
+    # in between is missed; events already sent are dropped below.
+    sub = broker.subscribe(user_id)
+    try:
+        yield f"retry: {RECONNECT_DELAY_MS}\n\n"
+        if last_event_id is None:
+            # A new stream starts after the events committed so far.
+            last = _last_seq(user_id)
+            db.session.close()
+        else:
+            last = last_event_id
+            for e in _committed_after(user_id, last):
+                yield _format(e)
+                last = e["seq"]
+
+        # `last` only moves forward through committed seqs in order, so a seq
+        # at or below it has been sent or predates the stream.
+        deadline = time.monotonic() + max_seconds
+        while not sub.lost:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                e = sub.queue.get(timeout=min(keepalive, remaining))
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            if e["seq"] <= last:
+                continue
+            if e["seq"] > last + 1:
+                # Its predecessors have committed; send them from the table first.
+                for missed in _committed_after(user_id, last):
+                    yield _format(missed)
+                    last = missed["seq"]
+                if e["seq"] <= last:
+                    continue
+            if e.get("payload") is None:
+                row = db.session.get(UserEvent, e["id"])
+                db.session.close()
+                if row is None:
+                    continue
+                e = _as_event(row)
+            yield _format(e)
+            last = e["seq"]
+    finally:
+        broker.unsubscribe(sub)
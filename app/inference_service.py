@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from app.services import predict_heart_risk_batch, predict_diabetes_risk_batch
+from app.threads import ProcessThreads
+
+
+class MicroBatchScheduler:
+    """
+    Coalesces concurrent single-row predictions into one matrix call.
+
+    A request that arrives while the model is idle is scored inline, so a
+    single user never waits on the batching window. Requests that arrive while
+    another prediction is in flight are queued; the worker thread scores the
+    queue once it holds `max_batch` rows or the oldest row has waited
+    `window_ms`, whichever comes first, and resolves each caller's future.
+
+    Only requests in flight in the same process at once are coalesced, so this
+    needs threaded workers (gunicorn's gthread, threads > 1, as set in
+    gunicorn.conf.py). With one thread per worker every request is scored
+    inline.
+    """
+
+    def __init__(self, name, score_batch, window_ms=2.0, max_batch=64):
+        self.name = name
+        self.score_batch = score_batch  # rows -> (labels, probabilities, model_version)
+        self.window = max(0.0, float(window_ms)) / 1000.0
+        self.max_batch = max(1, int(max_batch))
+
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._inflight = 0
+        self._worker = ProcessThreads(self._run, name=f"microbatch-{name}")
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "inline": 0,
+            "batches": 0,
+            "batched_rows": 0,
+            "max_batch_size": 0,
+            "queue_wait_total_ms": 0.0,
+            "queue_wait_max_ms": 0.0,
+        }
+
+    @property
+    def enabled(self):
+        return self.window > 0 and self.max_batch > 1
+
+    def predict(self, row):
+        """Score one row, returning (prediction, probability, model_version)."""
+        with self._cond:
+            idle = self._inflight == 0
+            self._inflight += 1
+        try:
+            if idle or not self.enabled:
+                self._record(inline=True)
+                return self._unpack(self.score_batch([row]), 0)
+            return self._submit(row).result()
+        finally:
+            with self._cond:
+                self._inflight -= 1
+
+    def stats(self):
+        with self._stats_lock:
+            s = dict(self._stats)
+        s["mean_batch_size"] = round(s["batched_rows"] / s["batches"], 2) if s["batches"] else 0.0
+        s["mean_queue_wait_ms"] = round(s["queue_wait_total_ms"] / s["batched_rows"], 3) if s["batched_rows"] else 0.0
+        s["window_ms"] = self.window * 1000.0
+        s["max_batch"] = self.max_batch
+        return s
+
+    def _submit(self, row):
+        fut = Future()
+        with self._cond:
+            self._worker.ensure()
+            self._pending.append((row, fut, time.perf_counter()))
+            self._cond.notify()
+        return fut
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # The window is measured from the oldest queued row: that bounds queue wait.
+                deadline = self._pending[0][2] + self.window
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                size = min(self.max_batch, len(self._pending))
+                batch = [self._pending.popleft() for _ in range(size)]
+            self._score(batch)
+
+    def _score(self, batch):
+        started = time.perf_counter()
+        waits = [(started - enqueued) * 1000.0 for _, _, enqueued in batch]
+        try:
+            scored = self.score_batch([row for row, _, _ in batch])
+        except Exception as e:
+            for _, fut, _ in batch:
+                fut.set_exception(e)
+            return
+        for i, (_, fut, _) in enumerate(batch):
+            fut.set_result(self._unpack(scored, i))
+        self._record(batch_size=len(batch), waits=waits)
+
+    @staticmethod
+    def _unpack(scored, i):
+        labels, probabilities, model_version = scored
+        if labels is None:
+            return None, 0.0, None
+        return labels[i], probabilities[i], model_version
+
+    def _record(self, inline=False, batch_size=0, waits=()):
+        with self._stats_lock:
+            s = self._stats
+            if inline:
+                s["requests"] += 1
+                s["inline"] += 1
+                return
+            s["requests"] += batch_size
+            s["batches"] += 1
+            s["batched_rows"] += batch_size
+            s["max_batch_size"] = max(s["max_batch_size"], batch_size)
+            s["queue_wait_total_ms"] += sum(waits)
+            s["queue_wait_max_ms"] = max(s["queue_wait_max_ms"], max(waits, default=0.0))
+
+
+BATCH_WINDOW_MS = float(os.getenv('INFERENCE_BATCH_WINDOW_MS', '2'))
+MAX_BATCH = int(os.getenv('INFERENCE_MAX_BATCH', '64'))
+
+heart_scheduler = MicroBatchScheduler("heart", predict_heart_risk_batch, BATCH_WINDOW_MS, MAX_BATCH)
+diabetes_scheduler = MicroBatchScheduler("diabetes", predict_diabetes_risk_batch, BATCH_WINDOW_MS, MAX_BATCH)
+
+
+def inference_stats():
+    return {
+        "heart": heart_scheduler.stats(),
+        "diabetes": diabetes_scheduler.stats(),
+    }
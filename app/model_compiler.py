@@ -0,0 +1,286 @@
+"""
+Compile fitted sklearn estimators into plain NumPy arrays and score them without sklearn.
+
+Supported: optional StandardScaler / MinMaxScaler pipeline steps followed by a
+binary LogisticRegression, linear-kernel SVC, LinearSVC, DecisionTreeClassifier,
+RandomForestClassifier or ExtraTreesClassifier. Anything else raises
+UnsupportedEstimator and callers keep using the sklearn model.
+
+    python -m app.model_compiler            # writes heart_model.npz / diabetes_model.npz next to the .pkl files
+"""
+import os
+import sys
+
+import numpy as np
+
+FORMAT_VERSION = 1
+PARITY_TOLERANCE = 1e-9
+
+
+class UnsupportedEstimator(Exception):
+    pass
+
+
+def compile_estimator(model):
+    """Return a dict of arrays describing `model`, or raise UnsupportedEstimator."""
+    steps = list(getattr(model, "steps", [("model", model)]))
+    transforms, (_, final) = steps[:-1], steps[-1]
+
+    arrays = {"format_version": np.array(FORMAT_VERSION)}
+    kinds = []
+    for i, (_, step) in enumerate(transforms):
+        if step is None or step == "passthrough":
+            continue
+        kind, step_arrays = _compile_transform(step)
+        kinds.append(kind)
+        for key, value in step_arrays.items():
+            arrays[f"s{len(kinds) - 1}_{key}"] = value
+
+    kind, method, step_arrays = _compile_final(final)
+    kinds.append(kind)
+    for key, value in step_arrays.items():
+        arrays[f"s{len(kinds) - 1}_{key}"] = value
+
+    classes = getattr(final, "classes_", None)
+    if classes is None or len(classes) != 2:
+        raise UnsupportedEstimator("only binary classifiers are supported")
+    arrays["classes"] = np.asarray(classes)
+    arrays["steps"] = np.array(kinds)
+    arrays["method"] = np.array(method)
+    arrays["n_features"] = np.array(getattr(model, "n_features_in_", -1))
+    return arrays
+
+
+def _compile_transform(step):
+    name = type(step).__name__
+    if name == "StandardScaler":
+        n = step.n_features_in_
+        mean = step.mean_ if step.with_mean and step.mean_ is not None else np.zeros(n)
+        scale = step.scale_ if step.with_std and step.scale_ is not None else np.ones(n)
+        return "standard_scaler", {"mean": np.asarray(mean, dtype=float), "scale": np.asarray(scale, dtype=float)}
+    if name == "MinMaxScaler":
+        arrays = {"scale": np.asarray(step.scale_, dtype=float), "min": np.asarray(step.min_, dtype=float)}
+        if getattr(step, "clip", False):
+            arrays["clip"] = np.asarray(step.feature_range, dtype=float)
+        return "minmax_scaler", arrays
+    raise UnsupportedEstimator(f"unsupported pipeline step {name}")
+
+
+def _compile_final(final):
+    name = type(final).__name__
+    if name == "LogisticRegression":
+        return "linear", "predict_proba", _linear_arrays(final)
+    if name == "SVC" and final.kernel == "linear" and not getattr(final, "probability", False):
+        return "linear", "decision_function", _linear_arrays(final)
+    if name == "LinearSVC":
+        return "linear", "decision_function", _linear_arrays(final)
+    if name == "DecisionTreeClassifier":
+        return "forest", "predict_proba", _forest_arrays([final])
+    if name in ("RandomForestClassifier", "ExtraTreesClassifier"):
+        return "forest", "predict_proba", _forest_arrays(final.estimators_)
+    raise UnsupportedEstimator(f"unsupported estimator {name}")
+
+
+def _linear_arrays(est):
+    coef = np.asarray(est.coef_, dtype=float)
+    if coef.ndim != 2 or coef.shape[0] != 1:
+        raise UnsupportedEstimator("only binary linear models are supported")
+    return {"coef": coef[0].copy(), "intercept": np.asarray(est.intercept_, dtype=float).reshape(-1)[:1].copy()}
+
+
+def _forest_arrays(trees):
+    # All trees are packed into one node table; children are absolute indices, -1 marks a leaf.
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    for tree in trees:
+        t = tree.tree_
+        if t.n_outputs != 1:
+            raise UnsupportedEstimator("multi-output trees are not supported")
+        value = np.asarray(t.value[:, 0, :], dtype=float)
+        norm = value.sum(axis=1, keepdims=True)
+        norm[norm == 0.0] = 1.0
+        roots.append(offset)
+        features.append(np.asarray(t.feature, dtype=np.int64))
+        thresholds.append(np.asarray(t.threshold, dtype=float))
+        lefts.append(np.where(t.children_left >= 0, t.children_left + offset, -1))
+        rights.append(np.where(t.children_right >= 0, t.children_right + offset, -1))
+        values.append(value / norm)
+        offset += t.node_count
+    return {
+        "feature": np.concatenate(features),
+        "threshold": np.concatenate(thresholds),
+        "left": np.concatenate(lefts).astype(np.int64),
+        "right": np.concatenate(rights).astype(np.int64),
+        "value": np.concatenate(values),
+        "roots": np.asarray(roots, dtype=np.int64),
+    }
+
+
+class NumpyScorer:
+    """
+    Evaluates compiled arrays with NumPy only; same interface as ModelScorer.
+
+    The arithmetic mirrors sklearn's (float32 feature comparison in trees,
+    sigmoid of the decision function for logistic regression), so outputs
+    match the source estimator to within PARITY_TOLERANCE.
+    """
+
+    engine = "numpy"
+    model = None
+
+    def __init__(self, arrays):
+        self.arrays = {k: np.asarray(v) for k, v in dict(arrays).items()}
+        if int(self.arrays["format_version"]) != FORMAT_VERSION:
+            raise UnsupportedEstimator(f"unknown compiled format {self.arrays['format_version']}")
+        self.steps = [str(s) for s in self.arrays["steps"]]
+        self.method = str(self.arrays["method"])
+        self.classes = self.arrays["classes"]
+        self.n_features = int(self.arrays["n_features"])
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls({k: data[k] for k in data.files})
+
+    def score(self, rows):
+        """Return (labels, probabilities) lists for a sequence of feature rows."""
+        if len(rows) == 0:
+            return [], []
+        X = np.array(rows, dtype=float)
+        for i, kind in enumerate(self.steps[:-1]):
+            X = self._transform(i, kind, X)
+
+        final = len(self.steps) - 1
+        if self.steps[final] == "linear":
+            score = self._decision(final, X)
+            p1 = 1.0 / (1.0 + np.exp(-score))
+            if self.method == "predict_proba":
+                idx = (p1 > 1.0 - p1).astype(int)
+            else:
+                idx = (score > 0).astype(int)
+        else:
+            proba = self._forest_proba(final, X)
+            p1 = proba[:, 1]
+            idx = proba.argmax(axis=1)
+        labels = [v.item() for v in self.classes[idx]]
+        return labels, np.clip(p1, 0.0, 1.0).tolist()
+
+    def transform(self, rows):
+        """Apply the compiled preprocessing steps to raw feature rows."""
+        X = np.array(rows, dtype=float)
+        for i, kind in enumerate(self.steps[:-1]):
+            X = self._transform(i, kind, X)
+        return X
+
+    def final_params(self):
+        """Arrays of the final estimator step, keyed without their step prefix."""
+        prefix = f"s{len(self.steps) - 1}_"
+        return {k[len(prefix):]: v for k, v in self.arrays.items() if k.startswith(prefix)}
+
+    def _step(self, i, key):
+        return self.arrays[f"s{i}_{key}"]
+
+    def _transform(self, i, kind, X):
+        if kind == "standard_scaler":
+            X -= self._step(i, "mean")
+            X /= self._step(i, "scale")
+        elif kind == "minmax_scaler":
+            X *= self._step(i, "scale")
+            X += self._step(i, "min")
+            if f"s{i}_clip" in self.arrays:
+                lo, hi = self._step(i, "clip")
+                np.clip(X, lo, hi, out=X)
+        return X
+
+    def _decision(self, i, X):
+        return X @ self._step(i, "coef") + self._step(i, "intercept")[0]
+
+    def _forest_proba(self, i, X):
+        roots, value = self._step(i, "roots"), self._step(i, "value")
+        nodes = walk_trees(X, roots, self._step(i, "feature"), self._step(i, "threshold"),
+                           self._step(i, "left"), self._step(i, "right"))
+        per_tree = value[nodes].reshape(X.shape[0], len(roots), -1)
+        proba = np.zeros((X.shape[0], per_tree.shape[2]))
+        for t in range(len(roots)):
+            proba += per_tree[:, t, :]
+        proba /= len(roots)
+        return proba
+
+
+def walk_trees(X, roots, feature, threshold, left, right, on_split=None):
+    """
+    Route every row of X down every tree of a compiled forest, all levels at once.
+    Returns the leaf reached for each (row, tree), row-major. `on_split(rows,
+    nodes, children)` is called at each level with the row index, split node and
+    child taken of every pair still descending.
+    """
+    # sklearn trees compare float32 inputs against float64 thresholds.
+    X32 = X.astype(np.float32)
+    rows = np.repeat(np.arange(X.shape[0]), len(roots))
+    nodes = np.tile(roots, X.shape[0])
+    active = left[nodes] >= 0
+    while active.any():
+        r, n = rows[active], nodes[active]
+        child = np.where(X32[r, feature[n]] <= threshold[n], left[n], right[n])
+        if on_split is not None:
+            on_split(r, n, child)
+        nodes[active] = child
+        active = left[nodes] >= 0
+    return nodes
+
+
+def check_parity(model, scorer, smoke_row, n_rows=2000, seed=0):
+    """
+    Compare `scorer` with the sklearn `model` on randomized rows around `smoke_row`.
+    Returns the max absolute probability difference; raises ValueError on any mismatch.
+    """
+    from app.model_registry import ModelScorer
+
+    rng = np.random.default_rng(seed)
+    base = np.asarray(smoke_row, dtype=float)
+    X = np.vstack([base, np.zeros_like(base), base * rng.uniform(0.0, 2.0, (n_rows, base.size))])
+    ref_labels, ref_p = ModelScorer(model).score(X)
+    labels, p = scorer.score(X)
+    if list(ref_labels) != list(labels):
+        raise ValueError("compiled labels differ from sklearn")
+    diff = float(np.max(np.abs(np.asarray(ref_p) - np.asarray(p))))
+    if diff > PARITY_TOLERANCE:
+        raise ValueError(f"compiled probabilities differ from sklearn by {diff:.3g}")
+    return diff
+
+
+def compile_file(pkl_path, smoke_row, checksum):
+    """Compile one .pkl artifact to <stem>.npz after a parity check. Returns the output path."""
+    import joblib
+
+    model = joblib.load(pkl_path)
+    arrays = compile_estimator(model)
+    diff = check_parity(model, NumpyScorer(arrays), smoke_row)
+    arrays["source_checksum"] = np.array(checksum)
+    out_path = os.path.splitext(pkl_path)[0] + ".npz"
+    tmp_path = out_path + ".tmp.npz"
+    np.savez_compressed(tmp_path, **arrays)
+    os.replace(tmp_path, out_path)
+    return out_path, diff
+
+
+def main(argv=None):
+    from app.model_registry import _sha256
+    from app.services import get_model_registry
+
+    model_registry = get_model_registry()
+
+    failed = False
+    for name, (filename, smoke_row) in model_registry.specs.items():
+        path = os.path.join(model_registry.model_dir, filename)
+        try:
+            out_path, diff = compile_file(path, smoke_row, _sha256(path))
+            print(f"{name}: wrote {out_path} (max |dp| vs sklearn {diff:.3g})")
+        except (UnsupportedEstimator, ValueError, FileNotFoundError) as e:
+            print(f"{name}: not compiled, sklearn will be used ({e})")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,276 @@
+import hashlib
+import math
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from app.model_compiler import NumpyScorer, UnsupportedEstimator, check_parity, compile_estimator
+
+
+class ModelScorer:
+    """
+    A fitted estimator plus the scoring method it supports, probed once at load.
+
+    Every score() call makes exactly one estimator call and derives both the
+    class label and a best-effort class-1 probability in [0, 1] from it:
+    predict_proba when available, else sigmoid(decision_function) (e.g. SVC
+    trained with probability=False), else a hard 0/1 from predict.
+    """
+
+    engine = "sklearn"
+
+    def __init__(self, model):
+        self.model = model
+        self.classes = getattr(model, "classes_", None)
+        self.method = self._probe(model)
+
+    @staticmethod
+    def _probe(model):
+        n_features = getattr(model, "n_features_in_", None)
+        probe = np.zeros((1, n_features)) if n_features else None
+        for method in ("predict_proba", "decision_function"):
+            if not hasattr(model, method):
+                continue
+            if probe is None:
+                return method
+            try:
+                out = np.asarray(getattr(model, method)(probe), dtype=float)
+            except Exception:
+                continue
+            # Multi-class decision scores can't be mapped to a class-1 probability.
+            if method == "decision_function" and out.ndim != 1:
+                continue
+            return method
+        return "predict"
+
+    def score(self, rows):
+        """Return (labels, probabilities) lists for a sequence of feature rows."""
+        if len(rows) == 0:
+            return [], []
+        X = np.asarray(rows, dtype=float)
+
+        if self.method == "predict_proba":
+            proba = np.asarray(self.model.predict_proba(X), dtype=float)
+            if proba.ndim == 2 and proba.shape[1] >= 2:
+                p1 = proba[:, 1]
+                idx = proba.argmax(axis=1)
+            else:
+                # Some estimators return (n,) for the positive class.
+                p1 = proba.reshape(-1)
+                idx = (p1 > 0.5).astype(int)
+            return self._labels(idx), np.clip(p1, 0.0, 1.0).tolist()
+
+        if self.method == "decision_function":
+            score = np.asarray(self.model.decision_function(X), dtype=float).reshape(-1)
+            # Map to (0,1) via sigmoid; not calibrated but monotonic.
+            p1 = 1.0 / (1.0 + np.exp(-score))
+            return self._labels((score > 0).astype(int)), np.clip(p1, 0.0, 1.0).tolist()
+
+        labels = [_as_label(v) for v in self.model.predict(X)]
+        probabilities = []
+        for label in labels:
+            try:
+                probabilities.append(1.0 if int(label) == 1 else 0.0)
+            except Exception:
+                probabilities.append(0.0)
+        return labels, probabilities
+
+    def _labels(self, idx):
+        labels = self.classes[idx] if self.classes is not None else idx
+        return [_as_label(v) for v in labels]
+
+
+def _as_label(value):
+    # NumPy scalars -> plain Python values so results serialize cleanly.
+    return value.item() if hasattr(value, "item") else value
+
+
+class ModelVersion:
+    """One loaded, validated model artifact."""
+
+    def __init__(self, name, path, checksum, stat_key, scorer):
+        self.name = name
+        self.path = path
+        self.checksum = checksum
+        self.version = checksum[:12]
+        self.stat_key = stat_key
+        self.scorer = scorer
+        self.loaded_at = datetime.utcnow()
+
+    def score(self, rows):
+        return self.scorer.score(rows)
+
+    def describe(self):
+        return {
+            "name": self.name,
+            "version": self.version,
+            "checksum": self.checksum,
+            "path": self.path,
+            "engine": self.scorer.engine,
+            "method": self.scorer.method,
+            "loaded_at": self.loaded_at.isoformat(),
+        }
+
+
+class ModelRegistry:
+    """
+    Holds the active version of each model and hot-swaps it when the artifact changes.
+
+    `specs` maps a model name to (filename, smoke_row). At most every
+    `reload_interval` seconds get() stats the artifact; when its size or mtime
+    changed, the file is checksummed (and compared to an optional
+    `<filename>.sha256` sidecar), loaded and scored against the smoke row.
+    Only a version that passes all checks replaces the active one, with a
+    single reference assignment, so in-flight requests keep the version they
+    started with.
+
+    With `fast_path=True` supported estimators are scored by a NumpyScorer:
+    a fresh `<stem>.npz` export (see app.model_compiler) is used without
+    unpickling the sklearn model at all; otherwise the loaded model is
+    compiled in memory and kept only if it passes a parity check.
+
+    With `mmap=True` NumPy arrays are memory-mapped from the artifact (joblib
+    `mmap_mode='r'`), so every worker process shares the same page-cache
+    pages instead of holding a private copy. Artifacts must therefore be
+    replaced atomically (write elsewhere, then os.replace), never rewritten in
+    place.
+
+    The last `keep_versions` activated versions of each model stay loaded, so
+    a stored result can still be explained by the model that scored it (see
+    get_version()).
+    """
+
+    def __init__(self, model_dir, specs, reload_interval=30.0, mmap=True, fast_path=True, keep_versions=2):
+        self.model_dir = model_dir
+        self.specs = dict(specs)
+        self.reload_interval = reload_interval
+        self.mmap = mmap
+        self.fast_path = fast_path
+        self.keep_versions = max(1, int(keep_versions))
+        self._active = {}
+        self._recent = {name: [] for name in self.specs}
+        self._history = {name: [] for name in self.specs}
+        self._checked_at = {}
+        self._rejected = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """Return the active ModelVersion for `name`, or None if it never loaded."""
+        now = time.monotonic()
+        checked_at = self._checked_at.get(name)
+        if checked_at is None or (self.reload_interval > 0 and now - checked_at >= self.reload_interval):
+            self._checked_at[name] = now
+            self.reload(name)
+        return self._active.get(name)
+
+    def reload(self, name):
+        """Load `name` if its artifact changed. Returns True when a new version was activated."""
+        filename, smoke_row = self.specs[name]
+        path = os.path.join(self.model_dir, filename)
+        with self._lock:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                if name not in self._active:
+                    print(f"Warning: Model {filename} not found at {self.model_dir}.")
+                return False
+            stat_key = (st.st_size, st.st_mtime_ns)
+            current = self._active.get(name)
+            if (current and current.stat_key == stat_key) or self._rejected.get(name) == stat_key:
+                return False
+
+            try:
+                candidate = self._load(name, path, stat_key, smoke_row)
+            except Exception as e:
+                print(f"Warning: Rejected model artifact {path}: {e}")
+                self._rejected[name] = stat_key
+                return False
+            if current and current.checksum == candidate.checksum:
+                current.stat_key = stat_key
+                return False
+
+            self._active[name] = candidate
+            self._history[name].append(candidate.describe())
+            recent = [v for v in self._recent[name] if v.version != candidate.version] + [candidate]
+            self._recent[name] = recent[-self.keep_versions:]
+        for listener in self._listeners:
+            listener(name, candidate)
+        return True
+
+    def get_version(self, name, version):
+        """Return the ModelVersion of `name` with this version id if it is still loaded, else None."""
+        self.get(name)
+        for model_version in self._recent.get(name, ()):
+            if model_version.version == version:
+                return model_version
+        return None
+
+    def add_listener(self, callback):
+        """Register callback(name, model_version), called after each activation."""
+        self._listeners.append(callback)
+
+    def versions(self, name):
+        return list(self._history.get(name, []))
+
+    def _load(self, name, path, stat_key, smoke_row):
+        checksum = _sha256(path)
+        expected_path = path + ".sha256"
+        if os.path.exists(expected_path):
+            with open(expected_path) as f:
+                expected = f.read().split()[0].strip().lower()
+            if expected != checksum:
+                raise ValueError(f"checksum {checksum[:12]} does not match {expected[:12]}")
+
+        scorer = self._load_compiled(path, checksum) if self.fast_path else None
+        if scorer is not None:
+            n_features, classes = scorer.n_features, scorer.classes
+        else:
+            import joblib
+
+            model = joblib.load(path, mmap_mode="r" if self.mmap else None)
+            n_features, classes = getattr(model, "n_features_in_", None), getattr(model, "classes_", None)
+            scorer = ModelScorer(model)
+            if self.fast_path:
+                try:
+                    compiled = NumpyScorer(compile_estimator(model))
+                    check_parity(model, compiled, smoke_row, n_rows=256)
+                    scorer = compiled
+                except (UnsupportedEstimator, ValueError):
+                    pass
+
+        if n_features is not None and n_features >= 0 and n_features != len(smoke_row):
+            raise ValueError(f"expects {n_features} features, not {len(smoke_row)}")
+        labels, probabilities = scorer.score([smoke_row])
+        if classes is not None and labels[0] not in list(classes):
+            raise ValueError(f"smoke test produced unknown label {labels[0]!r}")
+        if not math.isfinite(probabilities[0]) or not 0.0 <= probabilities[0] <= 1.0:
+            raise ValueError(f"smoke test produced invalid probability {probabilities[0]!r}")
+
+        return ModelVersion(name, path, checksum, stat_key, scorer)
+
+    @staticmethod
+    def _load_compiled(path, checksum):
+        # Only trust an export built from exactly this artifact.
+        npz_path = os.path.splitext(path)[0] + ".npz"
+        if not os.path.exists(npz_path):
+            return None
+        try:
+            scorer = NumpyScorer.load(npz_path)
+        except Exception as e:
+            print(f"Warning: Ignoring compiled model {npz_path}: {e}")
+            return None
+        if str(scorer.arrays.get("source_checksum", "")) != checksum:
+            return None
+        return scorer
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
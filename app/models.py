@@ -9,6 +9,9 @@ class User(db.Model):
     role = db.Column(db.String(20), nullable=False, default='patient')  # 'patient' | 'doctor'
 
 class Result(db.Model):
+    # Per-user history in time order (dashboard, /doctors, chatbot context, report export).
+    __table_args__ = (db.Index('ix_result_user_id_timestamp', 'user_id', 'timestamp', 'id'),)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     disease = db.Column(db.String(50), nullable=False)
@@ -16,6 +19,7 @@ class Result(db.Model):
     probability = db.Column(db.Float, nullable=True)
     disease_selected = db.Column(db.String(50), nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    model_version = db.Column(db.String(64), nullable=True)  # ModelVersion.version that scored this row
 
     # Heart disease fields
     age = db.Column(db.Integer)
@@ -49,7 +53,31 @@ class Doctor(db.Model):
     image = db.Column(db.String(200), nullable=True) # URL or path
 
 
+class ResultTrend(db.Model):
+    # Daily per-user, per-disease rollup of Result rows, maintained by app.trends
+    # in the same transaction as the inserts.
+    __table_args__ = (db.UniqueConstraint('user_id', 'day', 'disease', name='uq_result_trend_user_day_disease'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    disease = db.Column(db.String(50), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    probability_min = db.Column(db.Float, nullable=False)
+    probability_max = db.Column(db.Float, nullable=False)
+    probability_sum = db.Column(db.Float, nullable=False)
+    latest_probability = db.Column(db.Float, nullable=False)
+    latest_at = db.Column(db.DateTime, nullable=False)
+
+    @property
+    def probability_mean(self):
+        return self.probability_sum / self.count if self.count else 0.0
+
+
 class DoctorProfile(db.Model):
+    # Directory pages (/doctors, /api/doctors/) are keyset-paginated in this order.
+    __table_args__ = (db.Index('ix_doctor_profile_created_at', 'created_at', 'id'),)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), unique=True, nullable=False, index=True)
     specialization = db.Column(db.String(100), nullable=False)
@@ -70,6 +98,11 @@ class PatientReport(db.Model):
     disease_type = db.Column(db.String(50), nullable=False)
     risk_score = db.Column(db.Float, nullable=False)
     report_file_path = db.Column(db.String(500), nullable=True)
+    # Background PDF rendering (see app.render_queue): pending|rendering|ready|failed
+    render_status = db.Column(db.String(20), nullable=False, default='pending', server_default='pending')
+    render_attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    render_error = db.Column(db.String(500), nullable=True)
+    render_updated_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
     patient = db.relationship('User', foreign_keys=[patient_id])
@@ -77,12 +110,18 @@ class PatientReport(db.Model):
 
 
 class DoctorReviewRequest(db.Model):
+    # Request queues, newest activity first, for each side of the review.
+    __table_args__ = (
+        db.Index('ix_doctor_review_request_doctor_id_updated_at', 'doctor_id', 'updated_at', 'id'),
+        db.Index('ix_doctor_review_request_patient_id_updated_at', 'patient_id', 'updated_at', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
 
     status = db.Column(db.String(20), nullable=False, default='pending')  # pending|accepted|rejected|completed
 
-    patient_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
-    doctor_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    patient_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    doctor_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     report_id = db.Column(db.Integer, db.ForeignKey('patient_report.id'), nullable=False, index=True)
 
     doctor_notes = db.Column(db.Text, nullable=True)
@@ -96,11 +135,47 @@ class DoctorReviewRequest(db.Model):
 
 
 class Notification(db.Model):
+    __table_args__ = (db.Index('ix_notification_user_id_created_at', 'user_id', 'created_at', 'id'),)
+
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     message = db.Column(db.Text, nullable=False)
     is_read = db.Column(db.Boolean, nullable=False, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
     user = db.relationship('User', backref=db.backref('notifications', lazy='dynamic'))
 
+
+class UserEvent(db.Model):
+    # Outbox of events pushed to a user's event stream (see app.events); seq is
+    # the SSE event id that reconnecting clients send back as Last-Event-ID.
+    __table_args__ = (db.Index('uq_user_event_user_id_seq', 'user_id', 'seq', unique=True),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    seq = db.Column(db.BigInteger, nullable=False)  # per-user, in commit order (UserEventSequence)
+    kind = db.Column(db.String(30), nullable=False)  # notification|review_request
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class UserEventSequence(db.Model):
+    # Last UserEvent.seq handed out per user. app.events increments it with a row
+    # lock held until commit, so a user's events commit in seq order.
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    last_seq = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class NotificationCounter(db.Model):
+    # Unread notifications per user, kept in step with the notification table by
+    # app.notifications so badge polling is a primary-key lookup.
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    unread_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DirectoryVersion(db.Model):
+    # Single-row change counter for the doctor directory, bumped by app.directory
+    # in every transaction that changes a doctor; workers rebuild their in-memory
+    # snapshot when it moves.
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
@@ -0,0 +1,103 @@
+"""
+Notification service.
+
+All notification writes go through here so the per-user unread counter
+(NotificationCounter) stays in step with the notification table. Every
+function works inside the caller's transaction and leaves the commit to it,
+so a notification, its counter update and the change that caused it commit
+or roll back together.
+
+* notify_many() inserts any number of notifications with one executemany,
+  bumps each recipient's counter with one upsert per recipient and queues a
+  "notification" event for their event streams (app.events);
+* mark_read() / mark_all_read() are a single UPDATE each, restricted to
+  the user's unread rows, and subtract exactly the rows they changed (never
+  reset the counter, which may already include concurrent notifications);
+* unread_count() is a primary-key lookup on the counter.
+
+Counters for notifications that predate the table are filled in by the
+migration, or by update_schema.py on create_all deployments; a user without
+a counter row has no unread notifications.
+"""
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import case
+
+from app import db, events
+from app.db_engine import upsert_insert
+from app.models import Notification, NotificationCounter
+
+
+def notify(user_id, message):
+    notify_many([(user_id, message)])
+
+
+def notify_many(items):
+    """Insert notifications for (user_id, message) pairs. Returns how many were added."""
+    now = datetime.utcnow()
+    rows = [{"user_id": user_id, "message": message, "is_read": False, "created_at": now}
+            for user_id, message in items]
+    if not rows:
+        return 0
+    table = Notification.__table__
+    ids = db.session.execute(table.insert().returning(table.c.id, sort_by_parameter_order=True), rows).scalars()
+    events.emit_many([
+        (r["user_id"], "notification", {"id": notification_id, "message": r["message"], "is_read": False,
+                                        "created_at": now.isoformat()})
+        for notification_id, r in zip(ids, rows)
+    ])
+    connection = db.session.connection()
+    table = NotificationCounter.__table__
+    stmt = upsert_insert(connection.dialect.name)(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id],
+        set_={"unread_count": table.c.unread_count + stmt.excluded.unread_count},
+    )
+    counts = Counter(r["user_id"] for r in rows)
+    connection.execute(stmt, [{"user_id": user_id, "unread_count": n} for user_id, n in counts.items()])
+    return len(rows)
+
+
+def mark_read(user_id, notification_ids):
+    """Mark the user's notifications with these ids read. Returns the number that were unread."""
+    ids = {int(i) for i in notification_ids}
+    if not ids:
+        return 0
+    updated = db.session.execute(
+        Notification.__table__.update()
+        .where(Notification.user_id == user_id, Notification.id.in_(ids), Notification.is_read == False)  # noqa: E712
+        .values(is_read=True)
+    ).rowcount
+    _decrement_counter(user_id, updated)
+    return updated
+
+
+def mark_all_read(user_id):
+    updated = db.session.execute(
+        Notification.__table__.update()
+        .where(Notification.user_id == user_id, Notification.is_read == False)  # noqa: E712
+        .values(is_read=True)
+    ).rowcount
+    # Subtract what was marked rather than zeroing: notifications committed
+    # after the UPDATE above are still unread and already counted.
+    _decrement_counter(user_id, updated)
+    return updated
+
+
+def _decrement_counter(user_id, n):
+    if not n:
+        return
+    counter = NotificationCounter.unread_count
+    db.session.execute(
+        NotificationCounter.__table__.update()
+        .where(NotificationCounter.user_id == user_id)
+        .values(unread_count=case((counter > n, counter - n), else_=0))
+    )
+
+
+def unread_count(user_id):
+    count = db.session.execute(
+        db.select(NotificationCounter.unread_count).where(NotificationCounter.user_id == user_id)
+    ).scalar()
+    return count or 0
@@ -0,0 +1,93 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+A page is ordered by a timestamp column with the primary key as tie-breaker
+and the next page starts strictly after the last row of the previous one:
+
+    WHERE (updated_at, id) < (:last_updated_at, :last_id)
+    ORDER BY updated_at DESC, id DESC
+    LIMIT :page_size + 1
+
+so every page is one index range scan (see the composite indexes on the
+models), however deep the client pages. The extra row only tells whether
+another page exists.
+
+The cursor handed to clients is the (timestamp, id) pair as url-safe base64
+JSON; clients must treat it as opaque. JSON endpoints keep returning a plain
+list and advertise the next page in a `Link: <...>; rel="next"` header and
+in X-Next-Cursor, so the first page looks exactly like the old response.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from flask import current_app, jsonify, request, url_for
+from sqlalchemy import tuple_
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort_value, row_id):
+    payload = json.dumps([sort_value.isoformat(), int(row_id)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(token):
+    """Return the (datetime, id) pair encoded in `token`; raise InvalidCursor if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        sort_value, row_id = json.loads(raw)
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise InvalidCursor(f"invalid cursor: {token!r}") from e
+
+
+def page_args():
+    """(cursor, limit) from the query string; limit defaults to PAGE_SIZE_DEFAULT, capped at PAGE_SIZE_MAX."""
+    config = current_app.config
+    try:
+        limit = int(request.args.get("limit", config["PAGE_SIZE_DEFAULT"]))
+    except ValueError:
+        raise InvalidCursor("limit must be an integer")
+    limit = max(1, min(limit, config["PAGE_SIZE_MAX"]))
+    return request.args.get("cursor") or None, limit
+
+
+def keyset_page(query, sort_column, id_column, cursor=None, limit=50, descending=True, entity=None):
+    """
+    Return (rows, next_cursor) for one page of `query` ordered by
+    (sort_column, id_column). `entity(row)` picks the mapped object carrying
+    those columns when rows are tuples; next_cursor is None on the last page.
+    """
+    key = tuple_(sort_column, id_column)
+    if cursor:
+        after = tuple_(*decode_cursor(cursor))
+        query = query.filter(key < after if descending else key > after)
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = entity(rows[-1]) if entity else rows[-1]
+    return rows, encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+
+
+def next_page_url(next_cursor):
+    args = request.args.to_dict()
+    args["cursor"] = next_cursor
+    return url_for(request.endpoint, **request.view_args, **args)
+
+
+def jsonify_page(items, next_cursor):
+    """JSON list response for one page, linking the next page by header."""
+    response = jsonify(items)
+    if next_cursor:
+        response.headers["Link"] = f'<{next_page_url(next_cursor)}>; rel="next"'
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
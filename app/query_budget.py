@@ -0,0 +1,58 @@
+"""
+Per-request SQL query counting with a budget.
+
+Every statement executed while a request is being handled is counted via
+SQLAlchemy's before_cursor_execute event. When a request ends over its
+budget (QUERY_BUDGET_DEFAULT, or the one set with @query_budget(n) on the
+view), a warning naming the endpoint is logged; with QUERY_BUDGET_STRICT the
+request fails instead, which is how benchmarks.query_budget keeps N+1
+patterns from creeping back in. QUERY_COUNT_HEADER adds the count to each
+response as X-Query-Count.
+"""
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+def query_budget(max_queries):
+    """Declare the maximum number of SQL statements a view may execute per request."""
+    def decorate(view):
+        view.query_budget = max_queries
+        return view
+    return decorate
+
+
+def view_budget(app, endpoint):
+    view = app.view_functions.get(endpoint)
+    return getattr(view, "query_budget", app.config["QUERY_BUDGET_DEFAULT"])
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get("query_count", 0) + 1
+
+
+def init_app(app):
+    if not event.contains(Engine, "before_cursor_execute", _count_query):
+        event.listen(Engine, "before_cursor_execute", _count_query)
+
+    @app.before_request
+    def _reset_query_count():
+        g.query_count = 0
+
+    @app.after_request
+    def _check_query_budget(response):
+        count = g.get("query_count", 0)
+        if current_app.config["QUERY_COUNT_HEADER"]:
+            response.headers["X-Query-Count"] = str(count)
+        budget = view_budget(current_app, request.endpoint)
+        if budget is not None and count > budget:
+            message = f"{request.endpoint} ran {count} queries (budget {budget})"
+            if current_app.config["QUERY_BUDGET_STRICT"]:
+                raise QueryBudgetExceeded(message)
+            current_app.logger.warning(message)
+        return response
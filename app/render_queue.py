@@ -0,0 +1,153 @@
+"""
+Background rendering of PatientReport PDFs.
+
+Requests only record which reports need a PDF; the render itself runs on a
+small pool of worker threads once the transaction that created the report
+has committed, so neither request latency nor database lock time depends on
+reportlab. Each report moves through PatientReport.render_status:
+
+    pending -> rendering -> ready
+                         -> pending (retry, with exponential backoff)
+                         -> failed  (after `max_attempts`)
+
+Jobs live in process memory. A report whose job was lost (worker restart)
+is left `pending` or stuck in `rendering`; the report endpoint re-queues it
+the next time it is asked for.
+"""
+import atexit
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import event
+
+from app import db
+from app.threads import ProcessThreads
+
+
+class ReportRenderQueue:
+    def __init__(self, render, workers=1, max_attempts=3, retry_backoff=2.0):
+        self.render = render  # PatientReport -> file path; called inside an app context
+        self.workers = max(1, int(workers))
+        self.max_attempts = max(1, int(max_attempts))
+        self.retry_backoff = float(retry_backoff)
+        self.app = None
+
+        self._jobs = queue.Queue()
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._workers = ProcessThreads(self._run, name="report-render", count=self.workers)
+        self._stopping = False
+        self._timers = set()
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions["render_queue"] = self
+        atexit.register(self.drain)
+
+    def enqueue(self, report_id):
+        """Queue `report_id` for rendering unless it is already queued. Returns True if queued."""
+        with self._lock:
+            if self._stopping or report_id in self._queued:
+                return False
+            self._queued.add(report_id)
+            self._workers.ensure()
+        self._jobs.put(report_id)
+        return True
+
+    def enqueue_after_commit(self, report_id):
+        """Queue `report_id` once the current db.session transaction commits (dropped on rollback)."""
+        db.session.info.setdefault("pending_renders", set()).add(report_id)
+
+    def drain(self, timeout=30.0):
+        """Stop accepting jobs and wait up to `timeout` seconds for queued renders to finish."""
+        with self._lock:
+            if self._stopping:
+                return
+            self._stopping = True
+            for timer in list(self._timers):
+                timer.cancel()
+            threads = self._workers.alive()
+        for _ in threads:
+            self._jobs.put(None)
+        deadline = time.monotonic() + timeout
+        for t in threads:
+            t.join(max(0.0, deadline - time.monotonic()))
+
+    def _run(self):
+        while True:
+            report_id = self._jobs.get()
+            if report_id is None:
+                return
+            with self._lock:
+                self._queued.discard(report_id)
+            try:
+                with self.app.app_context():
+                    self._render_one(report_id)
+            except Exception as e:
+                print(f"Warning: Report render job {report_id} crashed: {e}")
+
+    def _render_one(self, report_id):
+        from app.models import PatientReport
+
+        report = db.session.get(PatientReport, report_id)
+        if report is None or report.render_status == "ready":
+            return
+        report.render_status = "rendering"
+        report.render_attempts = (report.render_attempts or 0) + 1
+        report.render_updated_at = datetime.utcnow()
+        db.session.commit()
+
+        try:
+            path = self.render(report)
+        except Exception as e:
+            db.session.rollback()
+            report = db.session.get(PatientReport, report_id)
+            report.render_error = str(e)[:500]
+            retry = report.render_attempts < self.max_attempts
+            report.render_status = "pending" if retry else "failed"
+            report.render_updated_at = datetime.utcnow()
+            db.session.commit()
+            if retry:
+                self._retry_later(report_id, self.retry_backoff * 2 ** (report.render_attempts - 1))
+            return
+
+        report.report_file_path = path
+        report.render_status = "ready"
+        report.render_error = None
+        report.render_updated_at = datetime.utcnow()
+        db.session.commit()
+
+    def _retry_later(self, report_id, delay):
+        def fire():
+            with self._lock:
+                self._timers.discard(timer)
+            self.enqueue(report_id)
+
+        timer = threading.Timer(delay, fire)
+        timer.daemon = True
+        with self._lock:
+            if self._stopping:
+                return
+            self._timers.add(timer)
+        timer.start()
+
+
+@event.listens_for(db.session, "after_commit")
+def _enqueue_committed_renders(session):
+    report_ids = session.info.pop("pending_renders", None)
+    if not report_ids:
+        return
+    from flask import current_app
+
+    render_queue = current_app.extensions.get("render_queue")
+    if render_queue is None:
+        return
+    for report_id in report_ids:
+        render_queue.enqueue(report_id)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_rolled_back_renders(session):
+    session.info.pop("pending_renders", None)
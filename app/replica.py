@@ -0,0 +1,59 @@
+"""
+Read-replica routing.
+
+With DATABASE_REPLICA_URL set, views decorated with @read_only run their
+queries on the replica (the "replica" bind, see db_engine.RoutingSession);
+everything else, and every write, stays on the primary.
+
+A replica trails the primary, so a user who has just written something
+(registered, requested a review, marked notifications read) could load a
+page that does not show it yet. Every committed transaction that wrote from
+a request stamps the user's session with the time, and for
+DB_REPLICA_LAG_WINDOW_SECONDS afterwards their @read_only views read from
+the primary as well. Set the window above the replica's worst normal lag.
+
+The doctor directory snapshot (app.directory) is shared by the worker, so a
+replica read may be served a snapshot built from the newer primary.
+
+Without a replica URL the decorator does nothing.
+"""
+import time
+from functools import wraps
+
+from flask import current_app, has_request_context, session
+from sqlalchemy import event
+
+from app import db
+
+WRITE_STAMP_KEY = "db_write_at"
+
+
+def _wrote_recently():
+    written_at = session.get(WRITE_STAMP_KEY)
+    return written_at is not None and time.time() - written_at < current_app.config["DB_REPLICA_LAG_WINDOW_SECONDS"]
+
+
+def read_only(view):
+    """Route the view's queries to the read replica, unless the user wrote within the lag window."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_app.config["DATABASE_REPLICA_URL"] or _wrote_recently():
+            return view(*args, **kwargs)
+        db.session.info["use_replica"] = True
+        try:
+            return view(*args, **kwargs)
+        finally:
+            db.session.info.pop("use_replica", None)
+    return wrapper
+
+
+@event.listens_for(db.session, "after_commit")
+def _stamp_write(db_session):
+    if db_session.info.pop("wrote", False) and has_request_context() \
+            and current_app.config["DATABASE_REPLICA_URL"]:
+        session[WRITE_STAMP_KEY] = time.time()
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_write(db_session):
+    db_session.info.pop("wrote", None)
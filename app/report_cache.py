@@ -0,0 +1,110 @@
+"""
+Content-addressed cache for rendered PDF reports on top of a report storage
+backend (see app.report_storage).
+
+A report is keyed by its result id, a hash of the exact data handed to
+generate_pdf_report() and REPORT_TEMPLATE_VERSION, so any change to the
+result, its explanation or the report layout renders a fresh file while an
+unchanged report is served straight from storage. The key doubles as the
+HTTP ETag and is what PatientReport.report_file_path records.
+
+Storage is bounded by `max_bytes`: a hit refreshes the file's mtime and,
+once a write pushes the total over budget, the least recently used files
+are deleted until it is back under LOW_WATER of the budget (so the full
+scan is not repeated on every write). Writes are atomic, so concurrent
+workers sharing the storage never see a partial PDF.
+"""
+import hashlib
+import json
+import threading
+
+from flask import current_app
+
+from app.report_storage import LocalShardedStorage
+from app.services import REPORT_TEMPLATE_VERSION, generate_pdf_report
+
+LOW_WATER = 0.9
+
+
+class ReportCache:
+    def __init__(self, storage, max_bytes=256 * 1024 * 1024):
+        self.storage = storage
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(result_id, data):
+        payload = json.dumps(data, sort_keys=True, default=str).encode()
+        digest = hashlib.sha256(b"%d:" % REPORT_TEMPLATE_VERSION + payload).hexdigest()
+        return f"{int(result_id)}-{digest[:32]}.pdf"
+
+    def get_or_render(self, result_id, data):
+        """Return the storage key of the report, rendering and storing it on a miss."""
+        key = self.key(result_id, data)
+        if self.storage.touch(key):
+            self.hits += 1
+            return key
+        self.misses += 1
+        written = self.storage.put(key, generate_pdf_report(data).getvalue())
+        with self._lock:
+            if self._size is not None:
+                self._size += written
+        self.evict()
+        return key
+
+    def open(self, key):
+        return self.storage.open(key)
+
+    def send(self, key, download_name, as_attachment=False):
+        response = self.storage.send(key, mimetype="application/pdf", download_name=download_name,
+                                     as_attachment=as_attachment, etag=key)
+        response.cache_control.private = True
+        return response
+
+    def evict(self):
+        """Delete least recently used files once storage exceeds max_bytes."""
+        with self._lock:
+            if self._size is not None and self._size <= self.max_bytes:
+                return
+            # Other workers write to the same storage, so re-sync the size from disk.
+            entries = sorted(self.storage.entries())
+            self._size = sum(size for _, size, _ in entries)
+            if self._size <= self.max_bytes:
+                return
+            target = self.max_bytes * LOW_WATER
+            for _, size, path in entries:
+                if self._size <= target:
+                    break
+                if self.storage.delete(path):
+                    self._size -= size
+                    self.evictions += 1
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size_bytes": self._size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+def get_report_cache():
+    """The ReportCache of the current app, created from its config on first use."""
+    cache = current_app.extensions.get("report_cache")
+    if cache is None:
+        config = current_app.config
+        storage = LocalShardedStorage(
+            config["REPORT_STORAGE_DIR"],
+            compression=config["REPORT_STORAGE_COMPRESSION"],
+            offload=config["REPORT_STORAGE_OFFLOAD"],
+            accel_prefix=config["REPORT_STORAGE_ACCEL_PREFIX"],
+            offload_min_bytes=config["REPORT_STORAGE_OFFLOAD_MIN_BYTES"],
+        )
+        cache = ReportCache(storage, config["REPORT_CACHE_MAX_BYTES"])
+        current_app.extensions["report_cache"] = cache
+    return cache
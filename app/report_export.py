@@ -0,0 +1,77 @@
+"""
+Streaming ZIP export of a patient's PDF reports.
+
+zipfile writes to any non-seekable stream (it falls back to data
+descriptors), so the archive is assembled into a small in-memory sink that
+the generator empties after every write. Each PDF is taken from the report
+cache (rendering it on a miss) and copied in fixed-size chunks, so memory
+stays flat regardless of how many reports are exported.
+"""
+import io
+import zipfile
+from datetime import datetime
+
+from app.report_cache import get_report_cache
+
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+class _ZipSink(io.RawIOBase):
+    """Write-only, non-seekable buffer whose contents are handed out and dropped by drain()."""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_reports_zip(results, report_data):
+    """
+    Yield the bytes of a ZIP holding one PDF per Result in `results`
+    (any iterable, e.g. a yield_per query). `report_data(result)` returns the
+    data dict for generate_pdf_report().
+    """
+    cache = get_report_cache()
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for result in results:
+            date = result.timestamp.strftime("%Y-%m-%d") if result.timestamp else "undated"
+            info = zipfile.ZipInfo(
+                f"health_report_{result.id}_{date}.pdf",
+                date_time=(result.timestamp or datetime(1980, 1, 1)).timetuple()[:6],
+            )
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with _open_report(cache, result, report_data(result)) as src, archive.open(info, mode="w") as dst:
+                for chunk in iter(lambda: src.read(COPY_CHUNK_SIZE), b""):
+                    dst.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
+
+
+def _open_report(cache, result, data):
+    try:
+        return cache.open(cache.get_or_render(result.id, data))
+    except FileNotFoundError:
+        # Evicted by a concurrent writer between lookup and open; render it again.
+        return cache.open(cache.get_or_render(result.id, data))
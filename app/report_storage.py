@@ -0,0 +1,176 @@
+"""
+Storage backends for rendered report files.
+
+Files are addressed by an opaque key (what PatientReport.report_file_path
+stores), never by a filesystem path, so the layout and the backend can
+change without touching the database.
+
+LocalShardedStorage keeps each file at <root>/<aa>/<bb>/<key><ext>, where
+aa/bb are the first hex digits of sha256(key), so no directory grows past a
+few hundred entries. Files can be compressed at rest with gzip or zstd
+(the latter needs the optional `zstandard` package).
+
+send() serves a file as an HTTP response:
+
+* uncompressed files go through send_file(conditional=True), which answers
+  If-None-Match with 304 and Range with 206;
+* compressed files are sent as-is with Content-Encoding when the client
+  accepts that encoding, and decompressed otherwise;
+* with `offload` set to "x-accel" (nginx) or "x-sendfile" (Apache,
+  lighttpd), uncompressed files of at least `offload_min_bytes` are handed
+  to the front proxy by header, so the worker never streams the bytes.
+"""
+import gzip
+import hashlib
+import os
+import uuid
+from io import BytesIO
+
+from flask import request, send_file
+
+COMPRESSION_SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("REPORT_STORAGE_COMPRESSION=zstd requires the 'zstandard' package")
+    return zstandard
+
+
+class LocalShardedStorage:
+    def __init__(self, root, compression=None, offload=None, accel_prefix="/protected-reports/",
+                 offload_min_bytes=0):
+        compression = (compression or "").lower() or None
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"unknown report compression {compression!r}; use gzip or zstd")
+        if compression == "zstd":
+            _zstd()
+        offload = (offload or "").lower() or None
+        if offload not in (None, "x-accel", "x-sendfile"):
+            raise ValueError(f"unknown report offload {offload!r}; use x-accel or x-sendfile")
+
+        self.root = os.path.abspath(root)
+        self.compression = compression
+        self.offload = offload
+        self.accel_prefix = "/" + accel_prefix.strip("/") + "/"
+        self.offload_min_bytes = offload_min_bytes
+
+    # -- layout --------------------------------------------------------------
+
+    def _relpath(self, key, compression):
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(digest[:2], digest[2:4], key + COMPRESSION_SUFFIXES[compression])
+
+    def _locate(self, key):
+        """Return (path, compression) of the stored file for `key`, or (None, None)."""
+        # Files written before a compression setting change stay readable.
+        for compression in dict.fromkeys([self.compression, None, "gzip", "zstd"]):
+            path = os.path.join(self.root, self._relpath(key, compression))
+            if os.path.exists(path):
+                return path, compression
+        return None, None
+
+    # -- blob operations -------------------------------------------------------
+
+    def exists(self, key):
+        return self._locate(key)[0] is not None
+
+    def touch(self, key):
+        """Mark `key` as recently used. Returns False if it is not stored."""
+        path, _ = self._locate(key)
+        if path is None:
+            return False
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def put(self, key, data):
+        """Store `data` under `key` atomically. Returns the number of bytes written to disk."""
+        if self.compression == "gzip":
+            data = gzip.compress(data, compresslevel=6, mtime=0)
+        elif self.compression == "zstd":
+            data = _zstd().ZstdCompressor().compress(data)
+        path = os.path.join(self.root, self._relpath(key, self.compression))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return len(data)
+
+    def open(self, key):
+        """Return a binary file object with the original (decompressed) bytes of `key`."""
+        path, compression = self._locate(key)
+        if path is None:
+            raise FileNotFoundError(key)
+        if compression == "gzip":
+            return gzip.open(path, "rb")
+        if compression == "zstd":
+            with open(path, "rb") as f:
+                return BytesIO(_zstd().ZstdDecompressor().decompress(f.read()))
+        return open(path, "rb")
+
+    def delete(self, path):
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def entries(self):
+        """Yield (mtime_ns, size, path) for every stored file."""
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield st.st_mtime_ns, st.st_size, path
+
+    # -- HTTP ------------------------------------------------------------------
+
+    def send(self, key, mimetype, download_name, as_attachment=False, etag=None):
+        path, compression = self._locate(key)
+        if path is None:
+            raise FileNotFoundError(key)
+
+        if compression is None:
+            if self.offload and os.path.getsize(path) >= self.offload_min_bytes:
+                return self._offload(path, mimetype, download_name, as_attachment, etag)
+            return send_file(path, mimetype=mimetype, as_attachment=as_attachment, download_name=download_name,
+                             etag=etag, conditional=True, max_age=0)
+
+        if compression in request.accept_encodings:
+            # Ranges then apply to the encoded bytes, which is what the client receives.
+            response = send_file(path, mimetype=mimetype, as_attachment=as_attachment, download_name=download_name,
+                                 etag=f"{etag}-{compression}" if etag else True, conditional=True, max_age=0)
+            response.content_encoding = compression
+        else:
+            with self.open(key) as f:
+                data = BytesIO(f.read())
+            response = send_file(data, mimetype=mimetype, as_attachment=as_attachment, download_name=download_name,
+                                 etag=etag or False, conditional=True, max_age=0)
+        response.vary.add("Accept-Encoding")
+        return response
+
+    def _offload(self, path, mimetype, download_name, as_attachment, etag):
+        response = send_file(BytesIO(), mimetype=mimetype, as_attachment=as_attachment, download_name=download_name,
+                             etag=etag or False, conditional=False, max_age=0)
+        if etag and request.if_none_match.contains(etag):
+            response.status_code = 304
+            return response
+        if self.offload == "x-accel":
+            rel = os.path.relpath(path, self.root).replace(os.sep, "/")
+            response.headers["X-Accel-Redirect"] = self.accel_prefix + rel
+        else:
+            response.headers["X-Sendfile"] = path
+        # The proxy supplies the body, its length and Range handling.
+        response.headers.pop("Content-Length", None)
+        return response
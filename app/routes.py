@@ -1,15 +1,47 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, send_file, jsonify, current_app, abort
+from flask import Blueprint, render_template, request, redirect, url_for, session, jsonify, current_app, abort, Response, stream_with_context, make_response
 from app import db
 from app.models import User, Result, Doctor, DoctorProfile, PatientReport, DoctorReviewRequest, Notification
-from app.services import get_preventive_measures, generate_pdf_report, predict_heart_risk, predict_diabetes_risk
+from app.services import (
+    get_preventive_measures, coerce_feature_row,
+    HEART_FEATURES, DIABETES_FEATURES, BATCH_MODELS,
+    explain_heart_risk_batch, explain_diabetes_risk_batch,
+)
 from app.chatbot_service import healthcare_chatbot
+from app.inference_service import heart_scheduler, diabetes_scheduler
+from app.report_cache import get_report_cache
+from app.render_queue import ReportRenderQueue
+from app.report_export import stream_reports_zip
+from app.query_budget import query_budget
+from app import events
+from app import notifications as notification_service
+from app.trends import record_results, trend_summary
+from app.doctor_search import search_legacy, search_profiles
+from app import directory
+from app.replica import read_only
+from app.pagination import InvalidCursor, jsonify_page, keyset_page, next_page_url, page_args
+from sqlalchemy.orm import joinedload
 from datetime import datetime
 import os
 
 main = Blueprint('main', __name__)
 
+
+@main.errorhandler(InvalidCursor)
+def _invalid_cursor(e):
+    if request.path.startswith('/api/'):
+        return jsonify({"error": str(e)}), 400
+    return str(e), 400
+
 REVIEW_STATUS = {'pending', 'accepted', 'rejected', 'completed'}
 
+BATCH_PREDICT_MAX_ROWS = int(os.getenv('BATCH_PREDICT_MAX_ROWS', '10000'))
+EXPLAIN_TOP_FACTORS = int(os.getenv('EXPLAIN_TOP_FACTORS', '5'))
+# Day/disease buckets plotted on the dashboard trend chart
+DASHBOARD_TREND_POINTS = int(os.getenv('DASHBOARD_TREND_POINTS', '60'))
+NOTIFICATIONS_MARK_READ_MAX_IDS = 1000
+DOCTOR_SEARCH_MAX_RESULTS = 20
+BATCH_EXPLAINERS = {"Heart Disease": explain_heart_risk_batch, "Diabetes": explain_diabetes_risk_batch}
+
 
 def _current_user():
     user_id = session.get('user_id')
@@ -34,9 +66,21 @@ def _require_role(role: str):
 
 
 def _notify(user_id: int, message: str):
-    n = Notification(user_id=user_id, message=message, is_read=False)
-    db.session.add(n)
-    return n
+    notification_service.notify(user_id, message)
+
+
+def _publish_review_status(r: DoctorReviewRequest):
+    """Push the request's new status to the patient's and the doctor's event streams."""
+    db.session.flush()  # assigns the id and updated_at
+    data = {
+        "id": r.id,
+        "status": r.status,
+        "patient_id": r.patient_id,
+        "doctor_id": r.doctor_id,
+        "report_id": r.report_id,
+        "updated_at": r.updated_at.isoformat(),
+    }
+    events.emit_many([(r.patient_id, "review_request", data), (r.doctor_id, "review_request", data)])
 
 
 def _result_inputs_for_report(result: Result):
@@ -62,34 +106,57 @@ def _result_inputs_for_report(result: Result):
         except Exception:
             return v
 
-    if "heart" in disease:
-        return [
-            ("Age", result.age),
-            ("Sex", sex_label(result.sex)),
-            ("Chest pain type (cp)", result.cp),
-            ("Resting blood pressure (trestbps)", result.trestbps),
-            ("Cholesterol (chol)", result.chol),
-            ("Fasting blood sugar > 120 mg/dl (fbs)", yn(result.fbs)),
-            ("Resting ECG (restecg)", result.restecg),
-            ("Max heart rate achieved (thalach)", result.thalach),
-            ("Exercise induced angina (exang)", yn(result.exang)),
-            ("ST depression (oldpeak)", result.oldpeak),
-            ("Slope (slope)", result.slope),
-        ]
-
+    formatters = {"sex": sex_label, "fbs": yn, "exang": yn}
     # Default to diabetes fields when not heart
+    features = HEART_FEATURES if "heart" in disease else DIABETES_FEATURES
     return [
-        ("Pregnancies", result.pregnancies),
-        ("Glucose", result.glucose),
-        ("Blood pressure (bp)", result.bp),
-        ("Skin thickness", result.skin_thickness),
-        ("Insulin", result.insulin),
-        ("BMI", result.bmi),
-        ("Diabetes pedigree function (dpf)", result.dpf),
-        ("Age", result.age),
+        (label, formatters.get(name, lambda v: v)(getattr(result, name)))
+        for name, _, label in features
     ]
 
 
+def _explain_result(result: Result):
+    """
+    Top per-feature contributions for a stored Result from the model version that
+    scored it, or None if unavailable (including once that version was unloaded).
+    """
+    disease = result.disease_selected or result.disease
+    if disease not in BATCH_MODELS or not result.model_version:
+        return None
+    features = BATCH_MODELS[disease][0]
+    row = [getattr(result, name) for name, _, _ in features]
+    if any(v is None for v in row):
+        return None
+    try:
+        explanations = BATCH_EXPLAINERS[disease]([row], top=EXPLAIN_TOP_FACTORS, model_version=result.model_version)
+    except Exception:
+        return None
+    return explanations[0] if explanations else None
+
+
+def _report_data(result: Result, username=None):
+    """Data dict for generate_pdf_report()."""
+    if username is None:
+        owner = User.query.get(result.user_id)
+        username = owner.username if owner else 'N/A'
+    return {
+        "username": username,
+        "date": result.timestamp.strftime('%Y-%m-%d %H:%M:%S') if result.timestamp else '',
+        "disease": result.disease,
+        "prediction": result.prediction,
+        "probability": result.probability,
+        "inputs": _result_inputs_for_report(result),
+        "explanation": _explain_result(result),
+    }
+
+
+def _send_report(result: Result, username=None, as_attachment=False):
+    """Serve the PDF for `result` from the report cache, rendering it on a miss (ETag/304 and Range aware)."""
+    cache = get_report_cache()
+    key = cache.get_or_render(result.id, _report_data(result, username))
+    return cache.send(key, download_name=f"health_report_{result.id}.pdf", as_attachment=as_attachment)
+
+
 def _ensure_report_for_result(result: Result) -> PatientReport:
     report = PatientReport.query.filter_by(result_id=result.id).first()
     if report:
@@ -105,30 +172,50 @@ def _ensure_report_for_result(result: Result) -> PatientReport:
     db.session.add(report)
     db.session.flush()
 
-    # Persist a PDF copy for doctor access (optional). If it fails, pipeline still works.
-    try:
-        reports_dir = os.path.join(current_app.root_path, 'reports')
-        os.makedirs(reports_dir, exist_ok=True)
-        pdf_path = os.path.join(reports_dir, f"health_report_{result.id}.pdf")
-        if not os.path.exists(pdf_path):
-            data = {
-                "username": User.query.get(result.user_id).username if User.query.get(result.user_id) else session.get('username', 'N/A'),
-                "date": result.timestamp.strftime('%Y-%m-%d %H:%M:%S') if result.timestamp else '',
-                "disease": result.disease,
-                "prediction": result.prediction,
-                "probability": result.probability,
-                "inputs": _result_inputs_for_report(result),
-            }
-            buf = generate_pdf_report(data)
-            with open(pdf_path, 'wb') as f:
-                f.write(buf.getvalue())
-        report.report_file_path = pdf_path
-    except Exception:
-        report.report_file_path = None
-
+    # Render the PDF for doctor access in the background once this transaction commits.
+    render_queue.enqueue_after_commit(report.id)
     return report
 
 
+def _render_report(report: PatientReport):
+    """Render job for render_queue: warm the report cache and return the storage key."""
+    return get_report_cache().get_or_render(report.result_id, _report_data(report.result))
+
+
+render_queue = ReportRenderQueue(
+    _render_report,
+    workers=int(os.getenv('REPORT_RENDER_WORKERS', '1')),
+    max_attempts=int(os.getenv('REPORT_RENDER_MAX_ATTEMPTS', '3')),
+)
+REPORT_RENDER_STALE_SECONDS = int(os.getenv('REPORT_RENDER_STALE_SECONDS', '300'))
+
+
+@main.record_once
+def _init_render_queue(state):
+    render_queue.init_app(state.app)
+
+
+def _report_not_ready(report: PatientReport):
+    """202 response for a report still being rendered, re-queueing it if its job was lost or failed."""
+    stale = (
+        report.render_status == 'rendering'
+        and report.render_updated_at is not None
+        and (datetime.utcnow() - report.render_updated_at).total_seconds() > REPORT_RENDER_STALE_SECONDS
+    )
+    if report.render_status == 'failed' or stale:
+        report.render_status = 'pending'
+        report.render_attempts = 0
+        db.session.commit()
+    if report.render_status == 'pending':
+        render_queue.enqueue(report.id)
+    response = jsonify({"report_id": report.id, "status": report.render_status})
+    response.status_code = 202
+    response.headers['Retry-After'] = '2'
+    # The doctor dashboard opens this URL in a tab; let the browser poll too.
+    response.headers['Refresh'] = '2'
+    return response
+
+
 @main.route('/')
 def index():
     return render_template('index.html')
@@ -214,6 +301,8 @@ def login():
     return render_template('login.html')
 
 @main.route('/dashboard')
+@query_budget(6)
+@read_only
 def dashboard():
     guard = _require_login()
     if guard:
@@ -222,18 +311,13 @@ def dashboard():
     if user and user.role == 'doctor':
         return redirect(url_for('main.doctor_dashboard'))
     
-    # Fetch user results for trends
-    user_results = Result.query.filter_by(user_id=session['user_id']).order_by(Result.timestamp).all()
-    
-    trends_data = {
-        "labels": [r.timestamp.strftime('%Y-%m-%d') for r in user_results],
-        "probabilities": [r.probability if r.probability else 0 for r in user_results],
-        "diseases": [r.disease_selected for r in user_results]
-    }
+    # Daily rollup, so the page does not grow with the user's history
+    trends_data = trend_summary(session['user_id'], max_points=DASHBOARD_TREND_POINTS)
 
     # Review requests + notifications
     my_requests = (
         DoctorReviewRequest.query
+        .options(joinedload(DoctorReviewRequest.doctor))
         .filter_by(patient_id=session['user_id'])
         .order_by(DoctorReviewRequest.updated_at.desc())
         .limit(25)
@@ -241,7 +325,7 @@ def dashboard():
     )
     my_requests_view = []
     for r in my_requests:
-        doctor_user = User.query.get(r.doctor_id)
+        doctor_user = r.doctor
         my_requests_view.append({
             "id": r.id,
             "status": r.status,
@@ -269,6 +353,8 @@ def dashboard():
 
 
 @main.route('/doctor/dashboard')
+@query_budget(6)
+@read_only
 def doctor_dashboard():
     guard = _require_login()
     if guard:
@@ -280,6 +366,7 @@ def doctor_dashboard():
     profile = DoctorProfile.query.filter_by(user_id=user.id).first()
     requests_q = (
         DoctorReviewRequest.query
+        .options(joinedload(DoctorReviewRequest.patient), joinedload(DoctorReviewRequest.report))
         .filter_by(doctor_id=user.id)
         .order_by(DoctorReviewRequest.updated_at.desc())
         .limit(50)
@@ -287,8 +374,8 @@ def doctor_dashboard():
     )
     review_requests_view = []
     for r in requests_q:
-        patient_user = User.query.get(r.patient_id)
-        report = PatientReport.query.get(r.report_id) if r.report_id else None
+        patient_user = r.patient
+        report = r.report
         review_requests_view.append({
             "id": r.id,
             "status": r.status,
@@ -339,7 +426,7 @@ def predict_heart():
             ]
             
             # Predict
-            result, probability = predict_heart_risk(data)
+            result, probability, model_version = heart_scheduler.predict(data)
             if result is None:
                 return "Heart model not loaded on server.", 500
             
@@ -351,6 +438,7 @@ def predict_heart():
                 prediction=prediction_text,
                 probability=round(probability * 100, 2),
                 disease_selected="Heart Disease",
+                model_version=model_version,
                 # Log other fields...
                 age=data[0], sex=data[1], cp=data[2], trestbps=data[3], chol=data[4],
                 fbs=data[5], restecg=data[6], thalach=data[7], exang=data[8],
@@ -360,8 +448,9 @@ def predict_heart():
             db.session.commit()
             
             guidance = get_preventive_measures("Heart Disease", probability)
+            explanation = _explain_result(new_result)
 
-            return render_template('results-heart.html', result=result, probability=round(probability*100, 2), guidance=guidance, result_id=new_result.id)
+            return render_template('results-heart.html', result=result, probability=round(probability*100, 2), guidance=guidance, result_id=new_result.id, explanation=explanation)
 
         except Exception as e:
             return f"Error: {e}"
@@ -381,7 +470,7 @@ def predict_diabetes():
                 float(request.form['dpf']), int(request.form['age'])
             ]
 
-            result, probability = predict_diabetes_risk(data)
+            result, probability, model_version = diabetes_scheduler.predict(data)
             if result is None:
                 return "Diabetes model not loaded on server.", 500
 
@@ -393,6 +482,7 @@ def predict_diabetes():
                 prediction=prediction_text,
                 probability=round(probability * 100, 2),
                 disease_selected="Diabetes",
+                model_version=model_version,
                 pregnancies=data[0], glucose=data[1], bp=data[2], skin_thickness=data[3],
                 insulin=data[4], bmi=data[5], dpf=data[6], age=data[7]
             )
@@ -400,32 +490,130 @@ def predict_diabetes():
             db.session.commit()
 
             guidance = get_preventive_measures("Diabetes", probability)
+            explanation = _explain_result(new_result)
 
-            return render_template('results-diabetes.html', result=result, probability=round(probability*100, 2), guidance=guidance, result_id=new_result.id)
+            return render_template('results-diabetes.html', result=result, probability=round(probability*100, 2), guidance=guidance, result_id=new_result.id, explanation=explanation)
 
         except Exception as e:
              return f"Error: {e}"
 
     return render_template('predict-diabetes.html')
 
+@main.route('/api/predict/batch', methods=['POST'])
+def api_predict_batch():
+    """
+    Score many rows for one disease with a single model call.
+
+    Request:
+    {
+        "disease": "Heart Disease" | "Diabetes",
+        "rows": [[...feature values in model order...] | {"age": 52, ...}],
+        "persist": false,
+        "explain": false
+    }
+
+    With "explain": true each result also carries its per-feature
+    contributions, computed for the whole batch in one vectorized pass.
+    """
+    if 'user_id' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    payload = request.get_json(silent=True) or {}
+    disease = payload.get('disease')
+    if disease not in BATCH_MODELS:
+        return jsonify({"error": f"disease must be one of: {', '.join(BATCH_MODELS)}"}), 400
+    rows = payload.get('rows')
+    if not isinstance(rows, list) or not rows:
+        return jsonify({"error": "rows must be a non-empty list"}), 400
+    if len(rows) > BATCH_PREDICT_MAX_ROWS:
+        return jsonify({"error": f"at most {BATCH_PREDICT_MAX_ROWS} rows per batch"}), 413
+
+    features, score_batch, positive_text, negative_text = BATCH_MODELS[disease]
+    data = []
+    for i, row in enumerate(rows):
+        try:
+            data.append(coerce_feature_row(features, row))
+        except ValueError as e:
+            return jsonify({"error": f"row {i}: {e}"}), 400
+
+    # Bulk intakes are mostly unique rows; keep them out of the per-form cache.
+    labels, probabilities, model_version = score_batch(data, use_cache=False)
+    if labels is None:
+        return jsonify({"error": f"{disease} model not loaded on server."}), 500
+
+    results = []
+    for i, (label, probability) in enumerate(zip(labels, probabilities)):
+        results.append({
+            "index": i,
+            "prediction": label,
+            "prediction_text": positive_text if label == 1 else negative_text,
+            "probability": round(probability * 100, 2),
+            "guidance": get_preventive_measures(disease, probability),
+        })
+
+    if payload.get('explain'):
+        explanations = BATCH_EXPLAINERS[disease](data, model_version=model_version)
+        for r, explanation in zip(results, explanations or [None] * len(results)):
+            r["explanation"] = explanation
+
+    persisted = 0
+    if payload.get('persist'):
+        now = datetime.utcnow()
+        names = [name for name, _, _ in features]
+        records = [
+            dict(
+                zip(names, values),
+                user_id=session['user_id'],
+                disease=disease,
+                disease_selected=disease,
+                prediction=r["prediction_text"],
+                probability=r["probability"],
+                model_version=model_version,
+                timestamp=now,
+            )
+            for values, r in zip(data, results)
+        ]
+        db.session.execute(Result.__table__.insert(), records)
+        record_results(db.session, records)
+        db.session.commit()
+        persisted = len(results)
+
+    return jsonify({
+        "disease": disease,
+        "model_version": model_version,
+        "count": len(results),
+        "persisted": persisted,
+        "results": results,
+    }), 200
+
+
 @main.route('/download_report/<int:result_id>')
 def download_report(result_id):
     result = Result.query.get_or_404(result_id)
     if result.user_id != session.get('user_id'):
         return "Unauthorized", 403
     
-    data = {
-        "username": session['username'],
-        "date": result.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-        "disease": result.disease,
-        "prediction": result.prediction,
-        "probability": result.probability,
-        "inputs": _result_inputs_for_report(result),
-    }
-    
-    pdf_buffer = generate_pdf_report(data)
-    
-    return send_file(pdf_buffer, as_attachment=True, download_name=f"health_report_{result_id}.pdf", mimetype='application/pdf')
+    return _send_report(result, session['username'], as_attachment=True)
+
+@main.route('/download_reports')
+def download_all_reports():
+    """Stream every report of the logged-in user as one ZIP archive."""
+    if 'user_id' not in session:
+        return redirect(url_for('main.login'))
+
+    username = session['username']
+    results = (
+        Result.query
+        .filter_by(user_id=session['user_id'])
+        .order_by(Result.timestamp, Result.id)
+        .yield_per(100)
+    )
+    body = stream_reports_zip(results, lambda result: _report_data(result, username))
+    return Response(
+        stream_with_context(body),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="health_reports_{username}.zip"'},
+    )
 
 @main.route('/logout')
 def logout():
@@ -594,34 +782,56 @@ def precautions():
     return render_template('precautions.html')
 
 @main.route('/doctors')
+@query_budget(4)
+@read_only
 def doctors():
     search = request.args.get('search', '')
-    # Prefer verified doctor profiles when present; fallback to legacy Doctor table.
-    q = db.session.query(DoctorProfile, User).join(User, DoctorProfile.user_id == User.id)
-    q = q.filter(User.role == 'doctor')
+    cursor, limit = page_args()
+    version = directory.current_version()
+
+    latest_result_id = None
+    if session.get('role') == 'patient':
+        latest = Result.query.filter_by(user_id=session['user_id']).order_by(Result.timestamp.desc()).first()
+        if latest:
+            latest_result_id = latest.id
+    # The page also shows who is logged in and their latest result.
+    etag = directory.etag_for(version, session.get('user_id', 0), latest_result_id or 0)
+    if directory.not_modified(etag):
+        return directory.tag_response(Response(status=304), etag, private=True)
+
     if search:
-        q = q.filter((User.username.contains(search)) | (DoctorProfile.specialization.contains(search)) | (DoctorProfile.hospital.contains(search)))
-    profiles = q.all()
+        # Ranked full-text matches; the best `limit` are shown, refine the search for others.
+        q = db.session.query(DoctorProfile, User).join(User, DoctorProfile.user_id == User.id)
+        q = q.filter(User.role == 'doctor')
+        profiles = [
+            directory.DirectoryEntry(p.id, p.created_at, u.id, u.username, p.specialization, p.experience_years,
+                                     p.hospital, p.contact_number, p.is_verified)
+            for (p, u) in search_profiles(q, search).limit(limit).all()
+        ]
+        next_cursor = None
+    else:
+        snapshot = directory.get_snapshot(version)
+        profiles, next_cursor = snapshot.page(cursor, limit)
 
-    if profiles:
+    if profiles or cursor:
         doctors_view = [
             {
                 "kind": "profile",
-                "doctor_user_id": u.id,
-                "name": u.username,
+                "doctor_user_id": p.user_id,
+                "name": p.username,
                 "specialization": p.specialization,
                 "experience": f"{p.experience_years} years",
                 "hospital": p.hospital,
                 "contact": p.contact_number,
                 "is_verified": p.is_verified,
             }
-            for (p, u) in profiles
+            for p in profiles
         ]
     else:
         if search:
-            legacy = Doctor.query.filter((Doctor.name.contains(search)) | (Doctor.specialization.contains(search))).all()
+            legacy = search_legacy(Doctor.query, search).all()
         else:
-            legacy = Doctor.query.all()
+            legacy = snapshot.legacy
         doctors_view = [
             {
                 "kind": "legacy",
@@ -636,14 +846,10 @@ def doctors():
             for d in legacy
         ]
 
-    latest_result_id = None
-    user = _current_user()
-    if user and user.role == 'patient':
-        latest = Result.query.filter_by(user_id=user.id).order_by(Result.timestamp.desc()).first()
-        if latest:
-            latest_result_id = latest.id
-
-    return render_template('doctors.html', doctors=doctors_view, search=search, latest_result_id=latest_result_id)
+    next_url = next_page_url(next_cursor) if next_cursor else None
+    response = make_response(render_template('doctors.html', doctors=doctors_view, search=search,
+                                             latest_result_id=latest_result_id, next_url=next_url))
+    return directory.tag_response(response, etag, private=True)
 
 @main.route('/government-support')
 def government_schemes():
@@ -653,24 +859,54 @@ def government_schemes():
 # ==================== REVIEW PIPELINE (STATEFUL) ====================
 
 @main.route('/api/doctors/', methods=['GET'])
+@query_budget(3)
+@read_only
 def api_doctors():
+    verified_only = request.args.get('verified_only', '0').lower() in ('1', 'true', 'yes')
+    cursor, limit = page_args()
+    version = directory.current_version()
+    etag = directory.etag_for(version)
+    if directory.not_modified(etag):
+        return directory.tag_response(Response(status=304), etag)
+    doctors, next_cursor = directory.get_snapshot(version).page(cursor, limit, verified_only=verified_only)
+    response = jsonify_page([
+        {
+            "doctor_user_id": p.user_id,
+            "username": p.username,
+            "specialization": p.specialization,
+            "experience_years": p.experience_years,
+            "hospital": p.hospital,
+            "contact_number": p.contact_number,
+            "is_verified": p.is_verified,
+        }
+        for p in doctors
+    ], next_cursor)
+    return directory.tag_response(response, etag)
+
+
+@main.route('/api/doctors/search/', methods=['GET'])
+@query_budget(1)
+@read_only
+def api_doctors_search():
+    """Type-ahead doctor lookup: ?q= words are matched as prefixes, best matches first."""
+    search = request.args.get('q', '').strip()
+    _, limit = page_args()
+    limit = min(limit, DOCTOR_SEARCH_MAX_RESULTS)
+    if not search:
+        return jsonify([])
     q = db.session.query(DoctorProfile, User).join(User, DoctorProfile.user_id == User.id)
     q = q.filter(User.role == 'doctor')
-    verified_only = request.args.get('verified_only', '0').lower() in ('1', 'true', 'yes')
-    if verified_only:
+    if request.args.get('verified_only', '0').lower() in ('1', 'true', 'yes'):
         q = q.filter(DoctorProfile.is_verified == True)  # noqa: E712
-    doctors = q.all()
     return jsonify([
         {
             "doctor_user_id": u.id,
             "username": u.username,
             "specialization": p.specialization,
-            "experience_years": p.experience_years,
             "hospital": p.hospital,
-            "contact_number": p.contact_number,
             "is_verified": p.is_verified,
         }
-        for (p, u) in doctors
+        for (p, u) in search_profiles(q, search).limit(limit).all()
     ])
 
 
@@ -713,18 +949,25 @@ def api_request_review():
     )
     db.session.add(req)
     _notify(doctor.id, f"New report review request from {session.get('username')}.")
+    _publish_review_status(req)
     db.session.commit()
 
     return jsonify({"request_id": req.id, "status": req.status}), 201
 
 
 @main.route('/api/my-requests/', methods=['GET'])
+@query_budget(2)
+@read_only
 def api_my_requests():
     role_guard = _require_role('patient')
     if role_guard:
         return role_guard
-    reqs = DoctorReviewRequest.query.filter_by(patient_id=session['user_id']).order_by(DoctorReviewRequest.updated_at.desc()).all()
-    return jsonify([
+    cursor, limit = page_args()
+    reqs, next_cursor = keyset_page(
+        DoctorReviewRequest.query.filter_by(patient_id=session['user_id']),
+        DoctorReviewRequest.updated_at, DoctorReviewRequest.id, cursor, limit,
+    )
+    return jsonify_page([
         {
             "id": r.id,
             "status": r.status,
@@ -735,16 +978,22 @@ def api_my_requests():
             "updated_at": r.updated_at.isoformat(),
         }
         for r in reqs
-    ])
+    ], next_cursor)
 
 
 @main.route('/api/doctor/requests/', methods=['GET'])
+@query_budget(2)
+@read_only
 def api_doctor_requests():
     role_guard = _require_role('doctor')
     if role_guard:
         return role_guard
-    reqs = DoctorReviewRequest.query.filter_by(doctor_id=session['user_id']).order_by(DoctorReviewRequest.updated_at.desc()).all()
-    return jsonify([
+    cursor, limit = page_args()
+    reqs, next_cursor = keyset_page(
+        DoctorReviewRequest.query.filter_by(doctor_id=session['user_id']),
+        DoctorReviewRequest.updated_at, DoctorReviewRequest.id, cursor, limit,
+    )
+    return jsonify_page([
         {
             "id": r.id,
             "status": r.status,
@@ -755,7 +1004,7 @@ def api_doctor_requests():
             "updated_at": r.updated_at.isoformat(),
         }
         for r in reqs
-    ])
+    ], next_cursor)
 
 
 def _get_doctor_request_or_404(request_id: int) -> DoctorReviewRequest:
@@ -779,6 +1028,7 @@ def api_doctor_accept():
         return jsonify({"error": "Only pending requests can be accepted"}), 409
     r.status = 'accepted'
     _notify(r.patient_id, "Your doctor has accepted your review request.")
+    _publish_review_status(r)
     db.session.commit()
     return jsonify({"id": r.id, "status": r.status}), 200
 
@@ -800,6 +1050,7 @@ def api_doctor_reject():
     if reason:
         r.doctor_notes = reason
     _notify(r.patient_id, "Your doctor has rejected your review request.")
+    _publish_review_status(r)
     db.session.commit()
     return jsonify({"id": r.id, "status": r.status}), 200
 
@@ -826,6 +1077,7 @@ def api_doctor_submit_review():
     if mark_completed:
         r.status = 'completed'
         _notify(r.patient_id, "Doctor completed your review. Check notes in your dashboard.")
+        _publish_review_status(r)
     db.session.commit()
     return jsonify({"id": r.id, "status": r.status}), 200
 
@@ -848,29 +1100,24 @@ def api_get_report_for_request(request_id: int):
             return jsonify({"error": "Forbidden"}), 403
 
     report = PatientReport.query.get_or_404(r.report_id)
-    if report.report_file_path and os.path.exists(report.report_file_path):
-        return send_file(report.report_file_path, as_attachment=False, mimetype='application/pdf')
-
-    # Fallback: generate on the fly from Result
+    if report.render_status != 'ready':
+        return _report_not_ready(report)
     result = Result.query.get_or_404(report.result_id)
-    data = {
-        "username": User.query.get(result.user_id).username if User.query.get(result.user_id) else 'N/A',
-        "date": result.timestamp.strftime('%Y-%m-%d %H:%M:%S') if result.timestamp else '',
-        "disease": result.disease,
-        "prediction": result.prediction,
-        "probability": result.probability,
-        "inputs": _result_inputs_for_report(result),
-    }
-    pdf_buffer = generate_pdf_report(data)
-    return send_file(pdf_buffer, as_attachment=False, download_name=f"health_report_{result.id}.pdf", mimetype='application/pdf')
+    return _send_report(result)
 
 
 @main.route('/api/notifications/', methods=['GET'])
+@query_budget(2)
+@read_only
 def api_notifications():
     if 'user_id' not in session:
         return jsonify({"error": "Unauthorized"}), 401
-    notes = Notification.query.filter_by(user_id=session['user_id']).order_by(Notification.created_at.desc()).limit(50).all()
-    return jsonify([
+    cursor, limit = page_args()
+    notes, next_cursor = keyset_page(
+        Notification.query.filter_by(user_id=session['user_id']),
+        Notification.created_at, Notification.id, cursor, limit,
+    )
+    return jsonify_page([
         {
             "id": n.id,
             "message": n.message,
@@ -878,7 +1125,7 @@ def api_notifications():
             "created_at": n.created_at.isoformat(),
         }
         for n in notes
-    ])
+    ], next_cursor)
 
 
 @main.route('/api/notifications/mark-read/', methods=['POST'])
@@ -886,14 +1133,67 @@ def api_notifications_mark_read():
     if 'user_id' not in session:
         return jsonify({"error": "Unauthorized"}), 401
     payload = request.get_json(silent=True) or {}
+    notification_ids = payload.get('notification_ids')
+    if notification_ids is not None:
+        if not isinstance(notification_ids, list) or len(notification_ids) > NOTIFICATIONS_MARK_READ_MAX_IDS:
+            return jsonify({"error": f"notification_ids must be a list of at most {NOTIFICATIONS_MARK_READ_MAX_IDS} ids"}), 400
+        try:
+            updated = notification_service.mark_read(session['user_id'], notification_ids)
+        except (TypeError, ValueError):
+            return jsonify({"error": "notification_ids must be integers"}), 400
+        db.session.commit()
+        return jsonify({"updated": updated, "unread_count": notification_service.unread_count(session['user_id'])}), 200
+
     notification_id = payload.get('notification_id')
     if not notification_id:
-        return jsonify({"error": "notification_id is required"}), 400
+        return jsonify({"error": "notification_id or notification_ids is required"}), 400
     n = Notification.query.get_or_404(int(notification_id))
     if n.user_id != session['user_id']:
         return jsonify({"error": "Forbidden"}), 403
-    n.is_read = True
+    notification_service.mark_read(n.user_id, [n.id])
     db.session.commit()
-    return jsonify({"id": n.id, "is_read": n.is_read}), 200
+    return jsonify({"id": n.id, "is_read": True}), 200
+
+
+@main.route('/api/notifications/mark-all-read/', methods=['POST'])
+def api_notifications_mark_all_read():
+    if 'user_id' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    updated = notification_service.mark_all_read(session['user_id'])
+    db.session.commit()
+    return jsonify({"updated": updated, "unread_count": notification_service.unread_count(session['user_id'])}), 200
+
+
+@main.route('/api/notifications/unread-count/', methods=['GET'])
+@query_budget(1)
+@read_only
+def api_notifications_unread_count():
+    if 'user_id' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    return jsonify({"unread_count": notification_service.unread_count(session['user_id'])})
+
+
+@main.route('/api/events/', methods=['GET'])
+def api_events():
+    """Server-Sent Events stream of the user's notifications and review request updates."""
+    if 'user_id' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({"error": "Last-Event-ID must be an integer"}), 400
+    config = current_app.config
+    stream = events.event_stream(
+        session['user_id'],
+        last_event_id,
+        max_seconds=config['SSE_MAX_STREAM_SECONDS'],
+        keepalive=config['SSE_KEEPALIVE_SECONDS'],
+    )
+    response = Response(stream_with_context(stream), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream.
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 
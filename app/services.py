@@ -1,22 +1,28 @@
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
 from io import BytesIO
-import joblib
+from collections import OrderedDict
 import os
-import numpy as np
-import math
-
-try:
-    from google import genai
-    from google.genai import types
-except Exception:  # pragma: no cover
-    genai = None
+import threading
+import time
 
 from flask import current_app
 
+# Heavy dependencies (reportlab, google-genai, numpy/joblib/sklearn via the model
+# registry) are imported on first use so create_app() stays fast; see warmup().
+
+
+def _import_genai():
+    try:
+        from google import genai
+        from google.genai import types
+    except Exception:  # pragma: no cover
+        return None, None
+    return genai, types
+
+
 def get_ai_client():
     # Support both naming conventions for the API key
     api_key = os.getenv('GEMINI_API_KEY') or os.getenv('GOOGLE_API_KEY')
+    genai, _ = _import_genai()
     if genai and api_key:
         try:
             return genai.Client(api_key=api_key)
@@ -41,6 +47,7 @@ def get_ai_response(user_message, history=[]):
         client = get_ai_client()
         if not client:
             return "AI service is not configured on this server. Please try again later."
+        _, types = _import_genai()
         
         # Use the newer, faster, and more efficient gemini-1.5-flash model
         # The new SDK supports system_instruction directly in generate_content or Client config
@@ -62,14 +69,6 @@ def get_ai_response(user_message, history=[]):
 DEFAULT_MODEL_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 MODEL_DIR = os.getenv('MODEL_DIR', DEFAULT_MODEL_DIR)
 
-try:
-    heart_model = joblib.load(os.path.join(MODEL_DIR, 'heart_model.pkl'))
-    diabetes_model = joblib.load(os.path.join(MODEL_DIR, 'diabetes_model.pkl'))
-except FileNotFoundError as e:
-    print(f"Warning: Models not found at {MODEL_DIR}. Error: {e}")
-    heart_model = None
-    diabetes_model = None
-
 def get_preventive_measures(disease, probability):
     """
     Returns structured medical guidance based on disease and risk probability.
@@ -131,108 +130,430 @@ def get_preventive_measures(disease, probability):
 
     return guidance
 
+# Bump whenever the layout of generate_pdf_report changes; cached PDFs are keyed on it.
+REPORT_TEMPLATE_VERSION = 4
+
+# Fonts registered on every report canvas, in this order, so the internal font
+# names (/F1, /F2, ...) baked into the pre-built chrome stay valid.
+_REPORT_FONTS = ("Helvetica", "Helvetica-Bold", "Helvetica-Oblique")
+# (font, size) pairs the per-report values are written in.
+_REPORT_VALUE_FONTS = (("Helvetica", 12), ("Helvetica", 11), ("Helvetica-Bold", 14))
+_REPORT_LABELS = (
+    # (y offset from the top, label)
+    (80, "Patient Report for:"),
+    (100, "Date:"),
+    (160, "Condition:"),
+    (180, "Prediction:"),
+    (200, "Probability:"),
+)
+_report_chrome = None
+
+
+def _get_report_chrome():
+    """
+    PDF content-stream operators for the static parts of every report, built
+    once per process: the header (title, rule, section heading, field labels),
+    which each report replays into a form XObject on its first page, and the
+    disclaimer, written at the foot of its last page. Reports then only draw
+    their own values.
+    """
+    global _report_chrome
+    if _report_chrome is not None:
+        return _report_chrome
+
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+    from reportlab.pdfgen import canvas
+
+    width, height = letter
+    scratch = canvas.Canvas(BytesIO(), pagesize=letter)
+    for font in _REPORT_FONTS:
+        scratch.setFont(font, 12)
+
+    header = scratch.beginText()
+    header.setFont("Helvetica-Bold", 20)
+    header.setTextOrigin(50, height - 50)
+    header.textOut("Smart Healthcare Early Risk System")
+    header.setFont("Helvetica-Bold", 14)
+    header.setTextOrigin(50, height - 140)
+    header.textOut("Prediction Result")
+    header.setFont("Helvetica", 12)
+    value_x = {}
+    for offset, label in _REPORT_LABELS:
+        header.setTextOrigin(50, height - offset)
+        header.textOut(label)
+        value_x[label] = 50 + stringWidth(label + " ", "Helvetica", 12)
+
+    disclaimer = scratch.beginText()
+    disclaimer.setFont("Helvetica-Oblique", 10)
+    disclaimer.setTextOrigin(50, 50)
+    disclaimer.textOut("Disclaimer: This is an AI-generated report and not a substitute for professional medical advice.")
+
+    def select_font(font, size):
+        # The operators a text object emits for setFont ("/F1 12 Tf 14.4 TL").
+        text = scratch.beginText()
+        text.setFont(font, size)
+        return text.getCode().split(" Tm ", 1)[1].removesuffix(" ET")
+
+    rule = f"{50} {height - 110:g} m {width - 50:g} {height - 110:g} l S"
+    _report_chrome = {
+        "header": header.getCode() + "\n" + rule,
+        "disclaimer": disclaimer.getCode(),
+        "value_x": value_x,
+        "fonts": {(font, size): select_font(font, size) for font, size in _REPORT_VALUE_FONTS},
+    }
+    return _report_chrome
+
+
+def _pdf_text(text):
+    """`text` as an escaped PDF literal string in WinAnsi (standard font) encoding."""
+    out = []
+    for b in str(text).encode("cp1252", "replace"):
+        if b in (0x28, 0x29, 0x5C):  # ( ) \
+            out.append("\\" + chr(b))
+        elif 32 <= b < 127:
+            out.append(chr(b))
+        else:
+            out.append(f"\\{b:03o}")
+    return "(" + "".join(out) + ")"
+
+
 def generate_pdf_report(result_data):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    chrome = _get_report_chrome()
     buffer = BytesIO()
-    p = canvas.Canvas(buffer, pagesize=letter)
+    # Uncompressed: reportlab ASCII85-encodes compressed streams unless that is
+    # switched off process-wide, which costs more than the few KB it saves.
+    p = canvas.Canvas(buffer, pagesize=letter, pageCompression=0)
     width, height = letter
+    for font in _REPORT_FONTS:
+        p.setFont(font, 12)
+
+    # Static chrome
+    p.beginForm("header")
+    p.addLiteral(chrome["header"])
+    p.endForm()
+    p.doForm("header")
+
+    # Variable text is written as raw text operators, one text block per page.
+    fonts = chrome["fonts"]
+    page = {"ops": ["BT"], "font": None}
 
-    # Header
-    p.setFont("Helvetica-Bold", 20)
-    p.drawString(50, height - 50, "Smart Healthcare Early Risk System")
-    
-    p.setFont("Helvetica", 12)
-    p.drawString(50, height - 80, f"Patient Report for: {result_data.get('username', 'N/A')}")
-    p.drawString(50, height - 100, f"Date: {result_data.get('date', 'N/A')}")
-
-    p.line(50, height - 110, width - 50, height - 110)
-
-    # Result
-    p.setFont("Helvetica-Bold", 14)
-    p.drawString(50, height - 140, "Prediction Result")
-    
-    p.setFont("Helvetica", 12)
-    p.drawString(50, height - 160, f"Condition: {result_data.get('disease')}")
-    p.drawString(50, height - 180, f"Prediction: {result_data.get('prediction')}")
-    p.drawString(50, height - 200, f"Probability: {result_data.get('probability')}%")
+    def draw(font, size, x, y, line):
+        ops = page["ops"]
+        if page["font"] != (font, size):
+            ops.append(fonts[font, size])
+            page["font"] = (font, size)
+        ops.append(f"1 0 0 1 {x:.2f} {y:.2f} Tm {_pdf_text(line)} Tj")
+
+    def flush():
+        page["ops"].append("ET")
+        p.addLiteral("\n".join(page["ops"]))
+
+    def new_page():
+        flush()
+        p.showPage()
+        page["ops"], page["font"] = ["BT"], None
+        return height - 60
+
+    # Header and result values
+    values = (
+        result_data.get('username', 'N/A'),
+        result_data.get('date', 'N/A'),
+        result_data.get('disease'),
+        result_data.get('prediction'),
+        f"{result_data.get('probability')}%",
+    )
+    for (offset, label), value in zip(_REPORT_LABELS, values):
+        draw("Helvetica", 12, chrome["value_x"][label], height - offset, str(value))
 
     # Inputs (what the user entered)
     inputs = result_data.get('inputs') or []
     y = height - 240
     if inputs:
-        p.setFont("Helvetica-Bold", 14)
-        p.drawString(50, y, "User Inputs")
+        draw("Helvetica-Bold", 14, 50, y, "User Inputs")
         y -= 18
 
-        p.setFont("Helvetica", 11)
         for label, value in inputs:
             if value is None or value == "":
                 continue
-            line = f"{label}: {value}"
             if y <= 90:
-                p.showPage()
-                y = height - 60
-                p.setFont("Helvetica", 11)
-            p.drawString(60, y, line)
+                y = new_page()
+            draw("Helvetica", 11, 60, y, f"{label}: {value}")
             y -= 14
 
-    # Disclaimer
-    p.setFont("Helvetica-Oblique", 10)
-    p.drawString(50, 50, "Disclaimer: This is an AI-generated report and not a substitute for professional medical advice.")
+    # Key factors (per-feature contributions, largest first)
+    explanation = result_data.get('explanation')
+    if explanation and explanation.get('factors'):
+        y -= 10
+        if y <= 120:
+            y = new_page()
+        draw("Helvetica-Bold", 14, 50, y, "Key Factors")
+        y -= 18
 
+        for factor in explanation['factors']:
+            direction = "raises" if factor['contribution'] > 0 else "lowers"
+            line = (f"{factor['label']} ({factor['value']:g}): {direction} risk "
+                    f"({factor['contribution']:+.3f} {explanation['units']})")
+            if y <= 90:
+                y = new_page()
+            draw("Helvetica", 11, 60, y, line)
+            y -= 14
+
+    flush()
+    p.addLiteral(chrome["disclaimer"])
     p.showPage()
     p.save()
     buffer.seek(0)
     return buffer
 
+# Model input columns, in the order the estimators were trained on:
+# (Result column name, type, label used in reports).
+HEART_FEATURES = (
+    ("age", int, "Age"),
+    ("sex", int, "Sex"),
+    ("cp", int, "Chest pain type (cp)"),
+    ("trestbps", int, "Resting blood pressure (trestbps)"),
+    ("chol", int, "Cholesterol (chol)"),
+    ("fbs", int, "Fasting blood sugar > 120 mg/dl (fbs)"),
+    ("restecg", int, "Resting ECG (restecg)"),
+    ("thalach", int, "Max heart rate achieved (thalach)"),
+    ("exang", int, "Exercise induced angina (exang)"),
+    ("oldpeak", float, "ST depression (oldpeak)"),
+    ("slope", int, "Slope (slope)"),
+)
+
+DIABETES_FEATURES = (
+    ("pregnancies", int, "Pregnancies"),
+    ("glucose", float, "Glucose"),
+    ("bp", float, "Blood pressure (bp)"),
+    ("skin_thickness", float, "Skin thickness"),
+    ("insulin", float, "Insulin"),
+    ("bmi", float, "BMI"),
+    ("dpf", float, "Diabetes pedigree function (dpf)"),
+    ("age", int, "Age"),
+)
+
+
+def coerce_feature_row(features, row):
+    """
+    Normalize one input row (a list in model order, or a dict keyed by
+    feature name) into a typed list. Raises ValueError on bad input.
+    """
+    if isinstance(row, dict):
+        missing = [name for name, _, _ in features if row.get(name) in (None, "")]
+        if missing:
+            raise ValueError(f"missing fields: {', '.join(missing)}")
+        values = [row[name] for name, _, _ in features]
+    else:
+        values = list(row)
+        if len(values) != len(features):
+            raise ValueError(f"expected {len(features)} values, got {len(values)}")
+    try:
+        return [cast(v) for (_, cast, _), v in zip(features, values)]
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"invalid value: {e}")
+
+
 def predict_heart_risk(input_data):
-    if not heart_model:
+    labels, probabilities, _ = predict_heart_risk_batch([input_data])
+    if labels is None:
         return None, 0.0
-    prediction = heart_model.predict([input_data])[0]
-    probability = _safe_model_probability(heart_model, [input_data], prediction=prediction)
-    return prediction, probability
+    return labels[0], probabilities[0]
 
 def predict_diabetes_risk(input_data):
-    if not diabetes_model:
+    labels, probabilities, _ = predict_diabetes_risk_batch([input_data])
+    if labels is None:
         return None, 0.0
-    prediction = diabetes_model.predict([input_data])[0]
-    probability = _safe_model_probability(diabetes_model, [input_data], prediction=prediction)
-    return prediction, probability
+    return labels[0], probabilities[0]
 
 
-def _safe_model_probability(model, X, prediction=None) -> float:
+def predict_heart_risk_batch(rows, use_cache=True):
     """
-    Return a best-effort probability for class 1 in [0, 1].
+    Score many heart feature rows with one vectorized model call.
+    Returns (labels, probabilities, model_version), or (None, None, None) if the model is missing.
+    """
+    return _score_with("heart", rows, use_cache)
+
 
-    Handles models that don't expose predict_proba (e.g., SVC trained with probability=False).
-    Falls back to sigmoid(decision_function) when available, otherwise a hard 0/1.
+def predict_diabetes_risk_batch(rows, use_cache=True):
     """
-    try:
-        if hasattr(model, "predict_proba"):
-            proba = model.predict_proba(X)
-            # Binary classifiers typically return shape (n, 2).
-            if hasattr(proba, "__len__") and len(proba) > 0 and len(proba[0]) >= 2:
-                p1 = float(proba[0][1])
-                return max(0.0, min(1.0, p1))
-            # Some estimators may return (n,) for positive class.
-            p = float(proba[0])
-            return max(0.0, min(1.0, p))
-    except Exception:
-        pass
+    Score many diabetes feature rows with one vectorized model call.
+    Returns (labels, probabilities, model_version), or (None, None, None) if the model is missing.
+    """
+    return _score_with("diabetes", rows, use_cache)
 
-    try:
-        if hasattr(model, "decision_function"):
-            score = model.decision_function(X)
-            s = float(score[0] if hasattr(score, "__len__") else score)
-            # Map to (0,1) via sigmoid; not calibrated but monotonic.
-            p = 1.0 / (1.0 + math.exp(-s))
-            return max(0.0, min(1.0, float(p)))
-    except Exception:
-        pass
-
-    # Final fallback: derive from predicted label.
-    try:
-        if prediction is None:
-            prediction = model.predict(X)[0]
-        return 1.0 if int(prediction) == 1 else 0.0
-    except Exception:
-        return 0.0
+
+def _score_with(name, rows, use_cache=True):
+    # Resolve the active version once so every row of a batch uses the same model.
+    model = get_model_registry().get(name)
+    if model is None:
+        return None, None, None
+    if not use_cache or not prediction_cache.enabled:
+        labels, probabilities = model.score(rows)
+        return labels, probabilities, model.version
+
+    keys = [(name, model.version, tuple(float(v) for v in row)) for row in rows]
+    scored = [prediction_cache.get(key) for key in keys]
+    misses = [i for i, hit in enumerate(scored) if hit is None]
+    if misses:
+        labels, probabilities = model.score([rows[i] for i in misses])
+        for i, label, probability in zip(misses, labels, probabilities):
+            scored[i] = (label, probability)
+            prediction_cache.put(keys[i], scored[i])
+    return [s[0] for s in scored], [s[1] for s in scored], model.version
+
+
+def explain_heart_risk_batch(rows, top=None, model_version=None):
+    """
+    Per-feature contributions for heart feature rows (see app.explainer), from the
+    active model or the loaded one with id `model_version`.
+    Returns one explanation dict per row, or None if the model is missing or can't be explained.
+    """
+    return _explain_with("heart", HEART_FEATURES, rows, top, model_version)
+
+
+def explain_diabetes_risk_batch(rows, top=None, model_version=None):
+    """
+    Per-feature contributions for diabetes feature rows (see app.explainer), from the
+    active model or the loaded one with id `model_version`.
+    Returns one explanation dict per row, or None if the model is missing or can't be explained.
+    """
+    return _explain_with("diabetes", DIABETES_FEATURES, rows, top, model_version)
+
+
+def _explain_with(name, features, rows, top=None, model_version=None):
+    from app.explainer import explain
+
+    registry = get_model_registry()
+    model = registry.get(name) if model_version is None else registry.get_version(name, model_version)
+    if model is None:
+        return None
+    return explain(name, model, features, rows, top)
+
+
+# disease -> (features, batch scorer, positive label text, negative label text)
+BATCH_MODELS = {
+    "Heart Disease": (HEART_FEATURES, predict_heart_risk_batch, "Heart Disease", "No Heart Disease"),
+    "Diabetes": (DIABETES_FEATURES, predict_diabetes_risk_batch, "Diabetes", "No Diabetes"),
+}
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache with a per-entry TTL for (model, version, features) -> (label, probability).
+
+    Keys carry the model version, so a reloaded model never serves stale
+    scores; invalidate() additionally drops the old version's entries.
+    """
+
+    def __init__(self, max_entries=4096, ttl=600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, name=None):
+        """Drop every entry, or only those of model `name`."""
+        with self._lock:
+            if name is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+            else:
+                stale = [k for k in self._entries if k[0] == name]
+                for k in stale:
+                    del self._entries[k]
+                dropped = len(stale)
+            self._stats["invalidations"] += dropped
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+            s["size"] = len(self._entries)
+        lookups = s["hits"] + s["misses"]
+        s["hit_rate"] = round(s["hits"] / lookups, 4) if lookups else 0.0
+        s["max_entries"] = self.max_entries
+        s["ttl"] = self.ttl
+        return s
+
+
+prediction_cache = PredictionCache(
+    max_entries=int(os.getenv('PREDICTION_CACHE_SIZE', '4096')),
+    ttl=float(os.getenv('PREDICTION_CACHE_TTL', '600')),
+)
+
+# A known-good input per model; a new artifact must score it before activation.
+SMOKE_ROWS = {
+    "heart": [52, 1, 0, 125, 212, 0, 1, 168, 0, 1.0, 2],
+    "diabetes": [2, 140.0, 70.0, 20.0, 80.0, 31.5, 0.5, 45],
+}
+
+_model_registry = None
+_model_registry_lock = threading.Lock()
+
+
+def get_model_registry():
+    """Return the process-wide ModelRegistry, creating it (without loading models) on first use."""
+    global _model_registry
+    if _model_registry is None:
+        with _model_registry_lock:
+            if _model_registry is None:
+                from app.model_registry import ModelRegistry
+
+                registry = ModelRegistry(
+                    MODEL_DIR,
+                    {
+                        "heart": ('heart_model.pkl', SMOKE_ROWS["heart"]),
+                        "diabetes": ('diabetes_model.pkl', SMOKE_ROWS["diabetes"]),
+                    },
+                    reload_interval=float(os.getenv('MODEL_RELOAD_INTERVAL', '30')),
+                    mmap=os.getenv('MODEL_MMAP', '1').lower() in ('1', 'true', 'yes'),
+                    fast_path=os.getenv('FAST_SCORER', '1').lower() in ('1', 'true', 'yes'),
+                    keep_versions=int(os.getenv('MODEL_KEEP_VERSIONS', '2')),
+                )
+                registry.add_listener(lambda name, _version: prediction_cache.invalidate(name))
+                _model_registry = registry
+    return _model_registry
+
+
+def warmup():
+    """
+    Load both models and the PDF renderer ahead of the first request.
+    Called from the gunicorn post_worker_init hook when MODEL_WARMUP=1.
+    """
+    registry = get_model_registry()
+    for name in registry.specs:
+        registry.get(name)
+    _get_report_chrome()
@@ -0,0 +1,40 @@
+"""
+Background threads that belong to the current process.
+
+Threads do not survive a fork: with gunicorn --preload a worker inherits the
+master's objects but none of its threads. ProcessThreads starts its threads
+lazily, in whichever process first needs them, and starts them again in a
+forked child or after one has died.
+"""
+import os
+import threading
+
+
+class ProcessThreads:
+    def __init__(self, target, name, count=1):
+        self.target = target
+        self.name = name
+        self.count = max(1, int(count))
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure(self):
+        """Start any of the `count` daemon threads this process is missing."""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._threads = []
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.count:
+                name = self.name if self.count == 1 else f"{self.name}-{len(self._threads)}"
+                t = threading.Thread(target=self.target, name=name, daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def alive(self):
+        """This process's running threads (none if they were started in another process)."""
+        with self._lock:
+            if self._pid != os.getpid():
+                return []
+            return [t for t in self._threads if t.is_alive()]
@@ -0,0 +1,149 @@
+"""
+Per-user risk trend rollup (ResultTrend) for the dashboard.
+
+Every Result is folded into one row per (user, day, disease) holding the
+count, min, max and sum of the probabilities and the latest probability, so
+the dashboard reads a bounded number of rows however long the user's
+history is.
+
+The rollup is updated in the transaction that inserts the results:
+
+* ORM inserts (db.session.add(Result(...))) are picked up by an after_flush
+  listener on db.session;
+* bulk Core inserts (Result.__table__.insert()) must call
+  record_results() with the same rows before committing.
+
+Each batch is pre-aggregated per bucket and written with a single
+INSERT ... ON CONFLICT DO UPDATE, so concurrent writers for the same user
+and day merge instead of racing. `flask rebuild-trends` recomputes the
+table from the result table.
+"""
+from datetime import datetime
+
+import click
+from sqlalchemy import case, event, func
+
+from app import db
+from app.db_engine import upsert_insert
+from app.models import Result, ResultTrend
+
+
+def _buckets(rows):
+    """Aggregate (user_id, disease, timestamp, probability) tuples into ResultTrend rows."""
+    buckets = {}
+    for user_id, disease, timestamp, probability in rows:
+        timestamp = timestamp or datetime.utcnow()
+        probability = probability or 0.0
+        key = (user_id, timestamp.date(), disease)
+        b = buckets.get(key)
+        if b is None:
+            buckets[key] = {
+                "user_id": user_id, "day": key[1], "disease": disease, "count": 1,
+                "probability_min": probability, "probability_max": probability, "probability_sum": probability,
+                "latest_probability": probability, "latest_at": timestamp,
+            }
+            continue
+        b["count"] += 1
+        b["probability_min"] = min(b["probability_min"], probability)
+        b["probability_max"] = max(b["probability_max"], probability)
+        b["probability_sum"] += probability
+        if timestamp >= b["latest_at"]:
+            b["latest_probability"], b["latest_at"] = probability, timestamp
+    return list(buckets.values())
+
+
+def record_results(session, rows):
+    """
+    Fold Result rows (dicts, or Result objects / rows with the same
+    attributes) into ResultTrend within the session's current transaction.
+    """
+    rows = [
+        (r["user_id"], r["disease_selected"], r.get("timestamp"), r.get("probability")) if isinstance(r, dict)
+        else (r.user_id, r.disease_selected, r.timestamp, r.probability)
+        for r in rows
+    ]
+    buckets = _buckets(rows)
+    if not buckets:
+        return
+    connection = session.connection()
+    table = ResultTrend.__table__
+    c = table.c
+    stmt = upsert_insert(connection.dialect.name)(table)
+    new = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[c.user_id, c.day, c.disease],
+        set_={
+            "count": c.count + new.count,
+            "probability_min": case((new.probability_min < c.probability_min, new.probability_min),
+                                    else_=c.probability_min),
+            "probability_max": case((new.probability_max > c.probability_max, new.probability_max),
+                                    else_=c.probability_max),
+            "probability_sum": c.probability_sum + new.probability_sum,
+            "latest_probability": case((new.latest_at >= c.latest_at, new.latest_probability),
+                                       else_=c.latest_probability),
+            "latest_at": case((new.latest_at >= c.latest_at, new.latest_at), else_=c.latest_at),
+        },
+    )
+    connection.execute(stmt, buckets)
+
+
+@event.listens_for(db.session, "after_flush")
+def _record_flushed_results(session, flush_context):
+    results = [obj for obj in session.new if isinstance(obj, Result)]
+    if results:
+        record_results(session, results)
+
+
+def trend_summary(user_id, max_points=60):
+    """
+    Dashboard trend data from the rollup: one chart point per day and disease
+    (the day's mean probability) for the most recent `max_points` buckets.
+    """
+    buckets = (
+        ResultTrend.query
+        .filter_by(user_id=user_id)
+        .order_by(ResultTrend.day.desc(), ResultTrend.latest_at.desc())
+        .limit(max_points)
+        .all()
+    )
+    total = db.session.query(func.coalesce(func.sum(ResultTrend.count), 0)).filter_by(user_id=user_id).scalar()
+    buckets.reverse()
+    return {
+        "labels": [b.day.strftime('%Y-%m-%d') for b in buckets],
+        "probabilities": [round(b.probability_mean, 2) for b in buckets],
+        "diseases": [b.disease for b in buckets],
+        "total": int(total),
+        "latest": buckets[-1].latest_probability if buckets else None,
+        "recent": [
+            {"disease": b.disease, "day": b.day.strftime('%Y-%m-%d'), "count": b.count,
+             "probability": b.latest_probability}
+            for b in reversed(buckets[-5:])
+        ],
+    }
+
+
+def rebuild_trends(user_id=None, batch_size=1000):
+    """Recompute ResultTrend from the result table (all users, or one). Returns the number of results."""
+    delete = ResultTrend.query
+    results = db.session.query(Result.user_id, Result.disease_selected, Result.timestamp, Result.probability)
+    if user_id is not None:
+        delete = delete.filter_by(user_id=user_id)
+        results = results.filter(Result.user_id == user_id)
+    delete.delete(synchronize_session=False)
+    count, chunk = 0, []
+    for row in results.order_by(Result.user_id, Result.timestamp).yield_per(batch_size):
+        chunk.append(row)
+        if len(chunk) >= batch_size:
+            record_results(db.session, chunk)
+            count, chunk = count + len(chunk), []
+    record_results(db.session, chunk)
+    db.session.commit()
+    return count + len(chunk)
+
+
+@click.command("rebuild-trends")
+@click.option("--user-id", type=int, help="Only rebuild this user's trends.")
+def rebuild_trends_command(user_id):
+    """Recompute the dashboard trend rollup from stored results."""
+    count = rebuild_trends(user_id)
+    click.echo(f"Rebuilt trends from {count} results.")
@@ -0,0 +1,142 @@
+"""
+Concurrent-writer benchmark for the SQLite engine profile.
+
+    python -m benchmarks.concurrent_writes
+    python -m benchmarks.concurrent_writes --workers 8 --seconds 10
+
+Each worker is a separate process with its own app and engine, like a
+gunicorn worker. In a loop it does what a prediction request does: read the
+user's history, insert a Result and commit, plus a dashboard-style read in
+its own transaction. The run is repeated with the old settings (rollback
+journal, synchronous=FULL, no mmap) and with the configured profile
+(app.db_engine), each on a fresh database file. For each profile it prints
+committed writes per second, write latency percentiles and how many
+operations failed with "database is locked".
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+PROFILES = {
+    "rollback-journal": {
+        "SQLITE_JOURNAL_MODE": "DELETE",
+        "SQLITE_SYNCHRONOUS": "FULL",
+        "SQLITE_MMAP_SIZE": "0",
+    },
+    # Whatever SQLITE_* is configured in the environment, else the app defaults.
+    "configured": {},
+}
+_CONFIGURED_ENV = {name: os.environ.get(name) for name in PROFILES["rollback-journal"]}
+
+
+def _create_app(db_url, profile):
+    os.environ["DATABASE_URL"] = db_url
+    for name, value in {**_CONFIGURED_ENV, **PROFILES[profile]}.items():
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+    from app import create_app
+
+    return create_app()
+
+
+def _worker(db_url, profile, user_id, seconds, start_at, out):
+    from sqlalchemy.exc import OperationalError
+
+    from app import db
+    from app.models import Result
+
+    app = _create_app(db_url, profile)
+    latencies, locked, reads = [], 0, 0
+    with app.app_context():
+        while time.time() < start_at:
+            time.sleep(0.001)
+        deadline = start_at + seconds
+        while time.time() < deadline:
+            t0 = time.perf_counter()
+            try:
+                Result.query.filter_by(user_id=user_id).order_by(Result.timestamp.desc()).first()
+                db.session.add(Result(user_id=user_id, disease="Heart Disease", disease_selected="Heart Disease",
+                                      prediction="Low Risk", probability=0.25, model_version="bench"))
+                db.session.commit()
+                latencies.append(time.perf_counter() - t0)
+            except OperationalError as e:
+                db.session.rollback()
+                if "locked" not in str(e) and "busy" not in str(e):
+                    raise
+                locked += 1
+            try:
+                Result.query.filter_by(user_id=user_id).order_by(Result.timestamp).limit(200).all()
+                db.session.commit()
+                reads += 1
+            except OperationalError as e:
+                db.session.rollback()
+                if "locked" not in str(e):
+                    raise
+                locked += 1
+    out.put((latencies, locked, reads))
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+def run_profile(profile, workers, seconds):
+    from app import db
+
+    tmp = tempfile.mkdtemp(prefix="shealthcare-writers-")
+    db_url = f"sqlite:///{tmp}/writers.db"
+    app = _create_app(db_url, profile)
+    with app.app_context():
+        db.create_all()
+        db.session.execute(db.text("INSERT INTO user (id, username, email, password, role) "
+                                   "VALUES (1, 'writer', 'writer@example.com', 'x', 'patient')"))
+        db.session.commit()
+        mode = db.session.execute(db.text("PRAGMA journal_mode")).scalar()
+        db.engine.dispose()
+
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    start_at = time.time() + 3  # give every process time to import the app
+    procs = [ctx.Process(target=_worker, args=(db_url, profile, 1, seconds, start_at, out)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    results = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    latencies = sorted(t for r in results for t in r[0])
+    return {
+        "journal_mode": mode,
+        "writes": len(latencies),
+        "writes_per_s": len(latencies) / seconds,
+        "reads_per_s": sum(r[2] for r in results) / seconds,
+        "p50_ms": _percentile(latencies, 50) * 1e3,
+        "p99_ms": _percentile(latencies, 99) * 1e3,
+        "locked": sum(r[1] for r in results),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    print(f"{args.workers} writer processes, {args.seconds:g}s per profile")
+    print(f"{'profile':<18} {'journal':>8} {'writes/s':>10} {'reads/s':>10} {'p50 ms':>8} {'p99 ms':>9} {'locked':>7}")
+    for profile in PROFILES:
+        r = run_profile(profile, args.workers, args.seconds)
+        print(f"{profile:<18} {r['journal_mode']:>8} {r['writes_per_s']:>10.1f} {r['reads_per_s']:>10.1f} "
+              f"{r['p50_ms']:>8.2f} {r['p99_ms']:>9.2f} {r['locked']:>7}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
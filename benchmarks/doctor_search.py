@@ -0,0 +1,111 @@
+"""
+Doctor search benchmark on a synthetic directory.
+
+    python -m benchmarks.doctor_search
+    python -m benchmarks.doctor_search --doctors 20000 --iterations 50
+
+Builds a throwaway SQLite database with N doctor accounts and profiles
+(bulk-inserted, then indexed with app.doctor_search.rebuild()) and times
+each search term three ways:
+
+* like-all: the old /doctors filter (LIKE '%term%' on username,
+  specialization and hospital), loading every match;
+* like-50: the same filter limited to one page;
+* fts-50: the full-text index, best 50 matches by rank.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+_TMP = tempfile.mkdtemp(prefix="shealthcare-search-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP}/search.db"
+
+FIRST = ["anna", "ben", "carla", "dev", "elena", "farid", "grace", "hiro", "ines", "jon", "kavya", "liam",
+         "maya", "nikhil", "olga", "pedro", "qi", "rosa", "sam", "tara", "uma", "victor", "wen", "yusuf"]
+LAST = ["smith", "chen", "garcia", "khan", "müller", "okafor", "patel", "rossi", "sato", "silva", "novak",
+        "nguyen", "kowalski", "haddad", "johansson", "dubois", "mensah", "ivanova", "lopez", "walker"]
+SPECIALIZATIONS = ["Cardiology", "Endocrinology", "General Physician", "Neurology", "Oncology", "Pediatrics",
+                   "Dermatology", "Nephrology", "Pulmonology", "Gastroenterology", "Cardiac Surgery",
+                   "Diabetology", "Internal Medicine", "Orthopedics", "Psychiatry", "Radiology"]
+HOSPITAL_WORDS = ["City", "Heart", "General", "Community", "Metro", "Saint", "Lakeside", "Valley", "Wellness",
+                  "Memorial", "University", "Riverside", "Northside", "Harbor", "Summit", "Cardiff"]
+HOSPITAL_KINDS = ["Hospital", "Clinic", "Institute", "Medical Center", "Health Center"]
+
+TERMS = ["card", "cardiology", "heart", "pat", "endo city", "okafor", "zzz"]
+
+
+def populate(db, count, seed=7):
+    from app.models import DoctorProfile, User
+
+    rng = random.Random(seed)
+    hospitals = [f"{rng.choice(HOSPITAL_WORDS)} {rng.choice(HOSPITAL_WORDS)} {rng.choice(HOSPITAL_KINDS)}"
+                 for _ in range(400)]
+    now = datetime.utcnow()
+    batch = 10000
+    for start in range(0, count, batch):
+        n = min(batch, count - start)
+        users = [{"id": start + i + 1, "username": f"{rng.choice(FIRST)}_{rng.choice(LAST)}_{start + i}",
+                  "email": f"doc{start + i}@example.com", "password": "x", "role": "doctor"} for i in range(n)]
+        db.session.execute(User.__table__.insert(), users)
+        db.session.execute(DoctorProfile.__table__.insert(), [
+            {"user_id": u["id"], "specialization": rng.choice(SPECIALIZATIONS), "experience_years": rng.randint(1, 40),
+             "hospital": rng.choice(hospitals), "contact_number": "", "license_number": f"SYN-{u['id']}",
+             "is_verified": rng.random() < 0.8, "created_at": now}
+            for u in users
+        ])
+    db.session.commit()
+
+
+def _time(fn, iterations):
+    fn()
+    samples = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        rows = fn()
+        samples.append(time.perf_counter() - t0)
+    samples.sort()
+    return samples[len(samples) // 2] * 1e3, len(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--doctors", type=int, default=100_000)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    from app import create_app, db
+    from app.doctor_search import rebuild, search_profiles
+    from app.models import DoctorProfile, User
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        t0 = time.perf_counter()
+        populate(db, args.doctors)
+        t1 = time.perf_counter()
+        with db.engine.begin() as conn:
+            rebuild(conn)
+        t2 = time.perf_counter()
+        print(f"{args.doctors} doctors: insert {t1 - t0:.1f}s, index build {t2 - t1:.1f}s")
+        print(f"{'term':<14} {'like-all ms':>12} {'rows':>7} {'like-50 ms':>11} {'fts-50 ms':>10} {'rows':>5}")
+
+        def base():
+            return db.session.query(DoctorProfile, User).join(User, DoctorProfile.user_id == User.id).filter(
+                User.role == "doctor")
+
+        for term in TERMS:
+            like = base().filter(User.username.contains(term) | DoctorProfile.specialization.contains(term)
+                                 | DoctorProfile.hospital.contains(term))
+            like_all, like_rows = _time(lambda: like.all(), args.iterations)
+            like_page, _ = _time(lambda: like.limit(50).all(), args.iterations)
+            fts_page, fts_rows = _time(lambda: search_profiles(base(), term).limit(50).all(), args.iterations)
+            print(f"{term:<14} {like_all:>12.2f} {like_rows:>7} {like_page:>11.2f} {fts_page:>10.2f} {fts_rows:>5}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
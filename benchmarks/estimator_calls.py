@@ -0,0 +1,85 @@
+"""
+Check that scoring makes exactly one estimator call per prediction or batch:
+
+    python -m benchmarks.estimator_calls
+
+Loads the bundled models with the NumPy fast path and the prediction cache
+off, so every score reaches the fitted estimator, and wraps its
+predict_proba / decision_function / predict. Single predictions
+(predict_heart_risk, predict_diabetes_risk) and a /api/predict/batch
+request must each call the estimator once, whichever method the model was
+probed to use. Exits with status 1 on any failure.
+"""
+import os
+import sys
+from collections import Counter
+
+os.environ["FAST_SCORER"] = "0"
+os.environ["PREDICTION_CACHE_SIZE"] = "0"
+
+from benchmarks.run import DIABETES_ROW, HEART_ROW, Context  # noqa: E402
+
+METHODS = ("predict_proba", "decision_function", "predict")
+BATCH_ROWS = 64
+
+
+def _count_calls(model, calls):
+    # e.g. LogisticRegression.predict_proba calls its own decision_function;
+    # only the outermost call is one made by the app.
+    depth = [0]
+    for method in METHODS:
+        original = getattr(model, method, None)
+        if original is None:
+            continue
+
+        def counted(*args, _method=method, _original=original, **kwargs):
+            if depth[0] == 0:
+                calls[_method] += 1
+            depth[0] += 1
+            try:
+                return _original(*args, **kwargs)
+            finally:
+                depth[0] -= 1
+
+        setattr(model, method, counted)
+
+
+def main(argv=None):
+    ctx = Context()
+    app = ctx.app
+
+    from app.services import get_model_registry, predict_diabetes_risk, predict_heart_risk
+
+    calls = Counter()
+    failures = []
+
+    def check(name, fn):
+        calls.clear()
+        fn()
+        ok = sum(calls.values()) == 1
+        print(f"{name:<40} {dict(calls)!s:<28} {'ok' if ok else 'FAIL'}")
+        if not ok:
+            failures.append(name)
+
+    with app.app_context():
+        registry = get_model_registry()
+        for name in ("heart", "diabetes"):
+            model = registry.get(name)
+            if model is None:
+                print(f"{name} model not loaded")
+                return 1
+            _count_calls(model.scorer.model, calls)
+
+        check("predict_heart_risk", lambda: predict_heart_risk(HEART_ROW))
+        check("predict_diabetes_risk", lambda: predict_diabetes_risk(DIABETES_ROW))
+
+    rows = [HEART_ROW[:3] + [HEART_ROW[3] + i] + HEART_ROW[4:] for i in range(BATCH_ROWS)]
+    check(f"/api/predict/batch ({BATCH_ROWS} rows)",
+          lambda: ctx.client.post("/api/predict/batch", json={"disease": "Heart Disease", "rows": rows}))
+
+    print(f"{len(failures)} failed" if failures else "all ok")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
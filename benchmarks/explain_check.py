@@ -0,0 +1,107 @@
+"""
+Check that the hot per-user queries are served by an index.
+
+    python -m benchmarks.explain_check
+    DATABASE_URL=postgresql://... python -m benchmarks.explain_check
+
+Each query shape is built with the same ORM expression the app uses and
+EXPLAINed against DATABASE_URL (the throwaway benchmark SQLite database by
+default). The script exits 1 when a plan reads a whole table or sorts rows
+itself instead of walking an index in order:
+
+* SQLite: EXPLAIN QUERY PLAN must not contain "SCAN <table>" or
+  "USE TEMP B-TREE FOR ORDER BY";
+* PostgreSQL: EXPLAIN (FORMAT JSON) must not contain a Seq Scan or Sort
+  node. Sequential scans and sorts are discouraged for the session first,
+  so a tiny table cannot hide a missing index behind a cheap seq scan.
+"""
+import sys
+
+from benchmarks.run import Context
+
+
+def _shapes():
+    from datetime import datetime
+
+    from sqlalchemy import tuple_
+
+    from app.models import DoctorProfile, DoctorReviewRequest, Notification, Result, User
+
+    after = tuple_(datetime(2024, 6, 1), 1000)
+
+    return [
+        ("dashboard results", Result.query.filter_by(user_id=1).order_by(Result.timestamp)),
+        ("latest result", Result.query.filter_by(user_id=1).order_by(Result.timestamp.desc()).limit(1)),
+        ("report export", Result.query.filter_by(user_id=1).order_by(Result.timestamp, Result.id)),
+        ("notifications", Notification.query.filter_by(user_id=1).order_by(Notification.created_at.desc()).limit(50)),
+        ("patient requests", DoctorReviewRequest.query.filter_by(patient_id=1)
+         .order_by(DoctorReviewRequest.updated_at.desc())),
+        ("doctor requests", DoctorReviewRequest.query.filter_by(doctor_id=1)
+         .order_by(DoctorReviewRequest.updated_at.desc())),
+        # Later keyset pages (app.pagination)
+        ("requests page", DoctorReviewRequest.query.filter_by(doctor_id=1)
+         .filter(tuple_(DoctorReviewRequest.updated_at, DoctorReviewRequest.id) < after)
+         .order_by(DoctorReviewRequest.updated_at.desc(), DoctorReviewRequest.id.desc()).limit(51)),
+        ("notifications page", Notification.query.filter_by(user_id=1)
+         .filter(tuple_(Notification.created_at, Notification.id) < after)
+         .order_by(Notification.created_at.desc(), Notification.id.desc()).limit(51)),
+        ("directory page", DoctorProfile.query.join(User, DoctorProfile.user_id == User.id)
+         .filter(User.role == "doctor", tuple_(DoctorProfile.created_at, DoctorProfile.id) > after)
+         .order_by(DoctorProfile.created_at, DoctorProfile.id).limit(51)),
+    ]
+
+
+def _sqlite_problems(conn, sql, params):
+    rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    plan = [row[-1] for row in rows]
+    problems = [line for line in plan if line.startswith("SCAN ") or "TEMP B-TREE" in line]
+    return plan, problems
+
+
+def _postgres_problems(conn, sql, params):
+    conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    conn.exec_driver_sql("SET LOCAL enable_sort = off")
+    (doc,) = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + sql, params).fetchone()
+    plan, problems = [], []
+
+    def walk(node, depth=0):
+        label = node["Node Type"] + (f" on {node['Relation Name']}" if "Relation Name" in node else "")
+        if "Index Name" in node:
+            label += f" using {node['Index Name']}"
+        plan.append("  " * depth + label)
+        if node["Node Type"] in ("Seq Scan", "Sort", "Incremental Sort"):
+            problems.append(label)
+        for child in node.get("Plans", ()):
+            walk(child, depth + 1)
+
+    walk(doc[0]["Plan"])
+    return plan, problems
+
+
+def main(argv=None):
+    from app import db
+
+    ctx = Context()
+    failed = False
+    with ctx.app.app_context():
+        engine = db.engine
+        explain = {"sqlite": _sqlite_problems, "postgresql": _postgres_problems}.get(engine.dialect.name)
+        if explain is None:
+            print(f"EXPLAIN check is not implemented for {engine.dialect.name}")
+            return 1
+        for name, query in _shapes():
+            compiled = query.statement.compile(dialect=engine.dialect)
+            params = compiled.construct_params()
+            if engine.dialect.positional:
+                params = tuple(params[key] for key in compiled.positiontup)
+            with engine.begin() as conn:
+                plan, problems = explain(conn, str(compiled), params)
+            failed = failed or bool(problems)
+            print(f"{name:<18} {'FULL SCAN/SORT' if problems else 'ok'}")
+            for line in plan:
+                print(f"    {line}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
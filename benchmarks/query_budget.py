@@ -0,0 +1,61 @@
+"""
+Check how many SQL queries each page/API route executes against its budget.
+
+    python -m benchmarks.query_budget
+
+Views declare a budget with @query_budget(n) (see app.query_budget); the
+others fall back to QUERY_BUDGET_DEFAULT. Routes are requested against the
+seeded benchmark database as the patient or the doctor, and the script
+exits 1 when any of them runs more queries than its budget, so N+1 patterns
+are caught before they reach production.
+"""
+import os
+import sys
+
+os.environ["QUERY_COUNT_HEADER"] = "1"
+os.environ["QUERY_BUDGET_STRICT"] = "0"
+
+from benchmarks.run import Context  # noqa: E402
+
+# (role, path)
+ROUTES = [
+    ("patient", "/dashboard"),
+    ("patient", "/doctors"),
+    ("patient", "/api/doctors/"),
+    ("patient", "/api/doctors/search/?q=card"),
+    ("patient", "/doctors?search=card"),
+    ("patient", "/api/my-requests/"),
+    ("patient", "/api/notifications/"),
+    ("patient", "/api/notifications/unread-count/"),
+    ("doctor", "/doctor/dashboard"),
+    ("doctor", "/api/doctor/requests/"),
+]
+
+
+def main(argv=None):
+    from app.query_budget import view_budget
+
+    ctx = Context()
+    app = ctx.app
+    clients = {"patient": ctx.client, "doctor": app.test_client()}
+    clients["doctor"].post("/login", data={"username": "bench_doctor", "password": "bench"})
+
+    failed = False
+    for role, path in ROUTES:
+        resp = clients[role].get(path)
+        count = int(resp.headers.get("X-Query-Count", -1))
+        with app.test_request_context(path):
+            from flask import request
+
+            budget = view_budget(app, request.url_rule.endpoint if request.url_rule else None)
+        status = "ok"
+        if resp.status_code != 200:
+            status, failed = f"HTTP {resp.status_code}", True
+        elif budget is not None and count > budget:
+            status, failed = "OVER BUDGET", True
+        print(f"{role:<8} {path:<34} {count:>4} queries  (budget {budget})  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,300 @@
+"""
+Offline latency/throughput benchmarks for the application's hot paths.
+
+Runs against a throwaway SQLite database and the bundled .pkl models, so the
+numbers are reproducible on a plain Linux box:
+
+    python -m benchmarks.run                         # run everything, print a table
+    python -m benchmarks.run -k predict --save baseline.json
+    python -m benchmarks.run --compare baseline.json --threshold 0.15
+
+--compare exits with status 1 when any benchmark's chosen percentile got
+slower than the baseline by more than --threshold (a fraction).
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_TMP = tempfile.mkdtemp(prefix="shealthcare-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_TMP}/bench.db")
+# Measure the model, not the memoization cache.
+os.environ.setdefault("PREDICTION_CACHE_SIZE", "0")
+os.environ.setdefault("REPORT_STORAGE_DIR", os.path.join(_TMP, "reports"))
+
+HEART_ROW = [52, 1, 0, 125, 212, 0, 1, 168, 0, 1.0, 2]
+DIABETES_ROW = [2, 140.0, 70.0, 20.0, 80.0, 31.5, 0.5, 45]
+
+BENCHMARKS = {}
+
+
+def benchmark(name, iterations=500, warmup=20):
+    """Register a setup function returning the zero-argument callable to time."""
+    def register(setup):
+        BENCHMARKS[name] = (setup, iterations, warmup)
+        return setup
+    return register
+
+
+class Context:
+    """Lazily created app, seeded database and logged-in test client shared by benchmarks."""
+
+    def __init__(self):
+        self._app = None
+        self._client = None
+
+    @property
+    def app(self):
+        if self._app is None:
+            from app import create_app, db
+
+            self._app = create_app()
+            with self._app.app_context():
+                db.create_all()
+                self._seed(db)
+        return self._app
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = self.app.test_client()
+            self._client.post("/login", data={"username": "bench_patient", "password": "bench"})
+        return self._client
+
+    @staticmethod
+    def _seed(db):
+        from app.models import User, DoctorProfile, Result, PatientReport, DoctorReviewRequest
+        from app.notifications import notify_many
+
+        if User.query.filter_by(username="bench_patient").first():
+            return
+        patient = User(username="bench_patient", email="bench_patient@example.com", password="bench", role="patient")
+        doctor = User(username="bench_doctor", email="bench_doctor@example.com", password="bench", role="doctor")
+        db.session.add_all([patient, doctor])
+        db.session.flush()
+        db.session.add(DoctorProfile(user_id=doctor.id, specialization="Cardiology", hospital="Bench Hospital",
+                                     license_number="BENCH-1", is_verified=True))
+        start = datetime(2024, 1, 1)
+        results = []
+        for i in range(500):
+            heart = i % 2 == 0
+            results.append(Result(
+                user_id=patient.id,
+                disease="Heart Disease" if heart else "Diabetes",
+                disease_selected="Heart Disease" if heart else "Diabetes",
+                prediction="No Heart Disease" if heart else "No Diabetes",
+                probability=float(i % 100),
+                timestamp=start + timedelta(hours=12 * i),
+                age=50,
+            ))
+        db.session.add_all(results)
+        db.session.flush()
+        for i, r in enumerate(results[:25]):
+            report = PatientReport(patient_id=patient.id, result_id=r.id, disease_type=r.disease,
+                                   risk_score=r.probability or 0.0)
+            db.session.add(report)
+            db.session.flush()
+            db.session.add(DoctorReviewRequest(patient_id=patient.id, doctor_id=doctor.id, report_id=report.id,
+                                               status="pending"))
+        notify_many([(patient.id, f"Notification {i}") for i in range(50)])
+        db.session.commit()
+
+
+def _report_data():
+    from app.services import HEART_FEATURES
+
+    return {
+        "username": "bench_patient",
+        "date": "2024-01-01 12:00:00",
+        "disease": "Heart Disease",
+        "prediction": "No Heart Disease",
+        "probability": 11.42,
+        "inputs": [(label, value) for (_, _, label), value in zip(HEART_FEATURES, HEART_ROW)],
+    }
+
+
+@benchmark("predict_heart_risk", iterations=2000)
+def _predict_heart(ctx):
+    from app.services import predict_heart_risk
+
+    return lambda: predict_heart_risk(HEART_ROW)
+
+
+@benchmark("predict_diabetes_risk", iterations=2000)
+def _predict_diabetes(ctx):
+    from app.services import predict_diabetes_risk
+
+    return lambda: predict_diabetes_risk(DIABETES_ROW)
+
+
+@benchmark("predict_heart_risk_batch_1000", iterations=100)
+def _predict_heart_batch(ctx):
+    from app.services import predict_heart_risk_batch
+
+    rows = [HEART_ROW] * 1000
+    return lambda: predict_heart_risk_batch(rows)
+
+
+@benchmark("explain_heart_risk_batch_1000", iterations=100)
+def _explain_heart_batch(ctx):
+    from app.services import explain_heart_risk_batch
+
+    rows = [HEART_ROW] * 1000
+    return lambda: explain_heart_risk_batch(rows, top=5)
+
+
+@benchmark("generate_pdf_report", iterations=200)
+def _generate_pdf(ctx):
+    from app.services import generate_pdf_report
+
+    data = _report_data()
+    return lambda: generate_pdf_report(data)
+
+
+@benchmark("route_download_report_cached", iterations=500)
+def _download_report(ctx):
+    client = ctx.client
+    with ctx.app.app_context():
+        from app.models import Result
+
+        result_id = Result.query.order_by(Result.id).first().id
+
+    def run():
+        resp = client.get(f"/download_report/{result_id}")
+        assert resp.status_code == 200, resp.status_code
+    return run
+
+
+@benchmark("chatbot_check_hardcoded_response", iterations=5000)
+def _chat_match(ctx):
+    from app.chatbot_service import healthcare_chatbot
+
+    messages = ["what are diabetes symptoms", "tell me something unrelated", "first aid for burns"]
+    state = {"i": 0}
+
+    def run():
+        state["i"] += 1
+        return healthcare_chatbot.check_hardcoded_response(messages[state["i"] % len(messages)])
+    return run
+
+
+@benchmark("route_dashboard", iterations=200)
+def _dashboard(ctx):
+    client = ctx.client
+
+    def run():
+        resp = client.get("/dashboard")
+        assert resp.status_code == 200, resp.status_code
+    return run
+
+
+def _percentile(sorted_values, pct):
+    # Nearest-rank percentile.
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def measure(fn, iterations, warmup):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter_ns()
+        fn()
+        samples.append((time.perf_counter_ns() - t0) / 1e6)
+    elapsed = time.perf_counter() - started
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "mean_ms": round(sum(samples) / len(samples), 4),
+        "p50_ms": round(_percentile(samples, 50), 4),
+        "p95_ms": round(_percentile(samples, 95), 4),
+        "p99_ms": round(_percentile(samples, 99), 4),
+        "throughput_per_s": round(iterations / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+
+def run(selected, iterations=None):
+    ctx = Context()
+    results = {}
+    for name, (setup, default_iterations, warmup) in BENCHMARKS.items():
+        if selected and not any(s in name for s in selected):
+            continue
+        fn = setup(ctx)
+        if ctx._app is not None:
+            with ctx.app.app_context():
+                results[name] = measure(fn, iterations or default_iterations, warmup)
+        else:
+            results[name] = measure(fn, iterations or default_iterations, warmup)
+        print(_format_row(name, results[name]), flush=True)
+    return {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold, metric):
+    """Return a list of (name, baseline_ms, current_ms, ratio) for regressions beyond `threshold`."""
+    regressions = []
+    for name, now in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before or not before.get(metric):
+            continue
+        ratio = now[metric] / before[metric]
+        flag = "REGRESSION" if ratio > 1.0 + threshold else ""
+        print(f"{name:<40} {before[metric]:>10.4f} -> {now[metric]:>10.4f} ms  x{ratio:5.2f} {flag}")
+        if flag:
+            regressions.append((name, before[metric], now[metric], ratio))
+    return regressions
+
+
+def _format_row(name, r):
+    return (f"{name:<40} p50 {r['p50_ms']:>9.4f} ms  p95 {r['p95_ms']:>9.4f} ms  "
+            f"p99 {r['p99_ms']:>9.4f} ms  {r['throughput_per_s']:>10.1f}/s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-k", dest="selected", action="append", help="only run benchmarks whose name contains this")
+    parser.add_argument("--iterations", type=int, help="override the per-benchmark iteration count")
+    parser.add_argument("--save", help="write results as a JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown fraction (default 0.15)")
+    parser.add_argument("--metric", default="p50_ms", choices=("p50_ms", "p95_ms", "p99_ms", "mean_ms"))
+    parser.add_argument("--list", action="store_true", help="list benchmark names and exit")
+    opts = parser.parse_args(argv)
+
+    if opts.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+
+    current = run(opts.selected, opts.iterations)
+    if opts.save:
+        with open(opts.save, "w") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+        print(f"saved {opts.save}")
+    if opts.compare:
+        with open(opts.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, opts.threshold, opts.metric)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed beyond {opts.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
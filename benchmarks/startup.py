@@ -0,0 +1,67 @@
+"""
+Enforce a cold-start budget for create_app() using `python -X importtime`.
+
+    python -m benchmarks.startup                     # default budget 1500 ms
+    python -m benchmarks.startup --budget-ms 900
+
+Fails (exit 1) when the cumulative import time of create_app() exceeds the
+budget, or when a heavy dependency that should be imported lazily (models,
+PDF rendering, the AI SDK) is imported during app creation.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+LAZY_MODULES = ("sklearn", "joblib", "numpy", "pandas", "scipy", "reportlab", "google.genai")
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure_import_time(runs=3):
+    """Return (best cumulative ms, set of imported module names) over `runs` fresh interpreters."""
+    code = "from app import create_app; create_app()"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    best, modules = None, set()
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=root, capture_output=True, text=True, check=True,
+        )
+        total_us, imported = 0, set()
+        for line in proc.stderr.splitlines():
+            m = _LINE.match(line)
+            if not m:
+                continue
+            imported.add(m.group(4))
+            if len(m.group(3)) == 1:  # top-level import: its cumulative time includes its children
+                total_us += int(m.group(2))
+        ms = total_us / 1000.0
+        if best is None or ms < best:
+            best, modules = ms, imported
+    return best, modules
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--runs", type=int, default=3)
+    opts = parser.parse_args(argv)
+
+    ms, modules = measure_import_time(opts.runs)
+    eager = sorted(m for m in modules if m.split(".")[0] in LAZY_MODULES or m in LAZY_MODULES)
+    print(f"create_app() import time: {ms:.1f} ms (budget {opts.budget_ms:.0f} ms)")
+    failed = False
+    if eager:
+        roots = sorted({m if m.startswith("google.") else m.split(".")[0] for m in eager})
+        print(f"imported eagerly but should be lazy: {', '.join(roots)}")
+        failed = True
+    if ms > opts.budget_ms:
+        print("over budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
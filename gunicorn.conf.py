@@ -0,0 +1,25 @@
+# Gunicorn picks this file up automatically from the working directory.
+import os
+
+# Threads per worker (gthread when > 1). Each open /api/events/ stream holds one
+# thread, so plain sync workers would be pinned by a single dashboard tab, and
+# the inference micro-batching (app.inference_service) only coalesces
+# predictions that run concurrently in one worker.
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+
+
+def post_worker_init(worker):
+    # Opt-in: load models (and reportlab) before the worker starts accepting
+    # requests, instead of paying for it on the first prediction.
+    if os.getenv('MODEL_WARMUP', '0').lower() in ('1', 'true', 'yes'):
+        from app.services import warmup
+
+        warmup()
+        worker.log.info("Models warmed up")
+
+
+def worker_exit(server, worker):
+    # Finish PDF renders queued by this worker before it goes away.
+    from app.routes import render_queue
+
+    render_queue.drain(timeout=float(os.getenv('REPORT_RENDER_DRAIN_TIMEOUT', '30')))
@@ -0,0 +1,35 @@
+"""Add render status to patient report
+
+Revision ID: 3e6b0c1f4a27
+Revises: 8c41d2a9e7b3
+Create Date: 2026-10-17 10:05:12.481930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e6b0c1f4a27'
+down_revision = '8c41d2a9e7b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('patient_report', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('render_status', sa.String(length=20), nullable=False, server_default='pending'))
+        batch_op.add_column(sa.Column('render_attempts', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('render_error', sa.String(length=500), nullable=True))
+        batch_op.add_column(sa.Column('render_updated_at', sa.DateTime(), nullable=True))
+
+    # Reports created before background rendering already had their PDF written inline.
+    op.execute("UPDATE patient_report SET render_status = 'ready' WHERE report_file_path IS NOT NULL")
+
+
+def downgrade():
+    with op.batch_alter_table('patient_report', schema=None) as batch_op:
+        batch_op.drop_column('render_updated_at')
+        batch_op.drop_column('render_error')
+        batch_op.drop_column('render_attempts')
+        batch_op.drop_column('render_status')
@@ -0,0 +1,26 @@
+"""Add model version to result
+
+Revision ID: 8c41d2a9e7b3
+Revises: 5f8f7573d0d9
+Create Date: 2026-10-16 09:12:44.105322
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41d2a9e7b3'
+down_revision = '5f8f7573d0d9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('result', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('model_version', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('result', schema=None) as batch_op:
+        batch_op.drop_column('model_version')
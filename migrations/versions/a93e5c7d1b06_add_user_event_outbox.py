@@ -0,0 +1,39 @@
+"""Add user event outbox
+
+Revision ID: a93e5c7d1b06
+Revises: f58c0d2e6a14
+Create Date: 2026-10-17 15:48:09.772314
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a93e5c7d1b06'
+down_revision = 'f58c0d2e6a14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_event',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=30), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('user_event', schema=None) as batch_op:
+        batch_op.create_index('ix_user_event_user_id_id', ['user_id', 'id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_user_event_created_at'), ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user_event', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_event_created_at'))
+        batch_op.drop_index('ix_user_event_user_id_id')
+
+    op.drop_table('user_event')
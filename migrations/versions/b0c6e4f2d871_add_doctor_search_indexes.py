@@ -0,0 +1,66 @@
+"""Add doctor search indexes
+
+Revision ID: b0c6e4f2d871
+Revises: a93e5c7d1b06
+Create Date: 2026-10-17 16:37:55.104263
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b0c6e4f2d871'
+down_revision = 'a93e5c7d1b06'
+branch_labels = None
+depends_on = None
+
+# (index name, source table, name column); see app.doctor_search
+INDEXES = [
+    ('doctor_profile', 'doctor_profile', 'username'),
+    ('doctor', 'doctor', 'name'),
+]
+
+SOURCES = {
+    'doctor_profile': (
+        'SELECT p.id, u.username, p.specialization, p.hospital '
+        'FROM doctor_profile p JOIN "user" u ON u.id = p.user_id'
+    ),
+    'doctor': 'SELECT id, name, specialization, hospital FROM doctor',
+}
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    for name, source, name_column in INDEXES:
+        if dialect == 'sqlite':
+            op.execute(
+                f"CREATE VIRTUAL TABLE {name}_fts USING fts5("
+                f"{name_column}, specialization, hospital, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+            op.execute(
+                f"INSERT INTO {name}_fts (rowid, {name_column}, specialization, hospital) {SOURCES[name]}"
+            )
+        elif dialect == 'postgresql':
+            op.execute(
+                f"CREATE TABLE {name}_search ("
+                f"id INTEGER PRIMARY KEY REFERENCES {source} (id) ON DELETE CASCADE, "
+                f"document TSVECTOR NOT NULL)"
+            )
+            op.execute(f"CREATE INDEX ix_{name}_search_document ON {name}_search USING GIN (document)")
+            op.execute(
+                f"INSERT INTO {name}_search (id, document) "
+                f"SELECT id, setweight(to_tsvector('simple', coalesce(n, '')), 'A') "
+                f"|| setweight(to_tsvector('simple', coalesce(s, '')), 'B') "
+                f"|| setweight(to_tsvector('simple', coalesce(h, '')), 'C') "
+                f"FROM ({SOURCES[name]}) AS src (id, n, s, h)"
+            )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    for name, _, _ in INDEXES:
+        if dialect == 'sqlite':
+            op.execute(f"DROP TABLE IF EXISTS {name}_fts")
+        elif dialect == 'postgresql':
+            op.execute(f"DROP TABLE IF EXISTS {name}_search")
@@ -0,0 +1,47 @@
+"""Add composite indexes for hot queries
+
+Revision ID: b71d4e09c2a5
+Revises: 3e6b0c1f4a27
+Create Date: 2026-10-17 11:42:37.905114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b71d4e09c2a5'
+down_revision = '3e6b0c1f4a27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('result', schema=None) as batch_op:
+        batch_op.create_index('ix_result_user_id_timestamp', ['user_id', 'timestamp', 'id'], unique=False)
+
+    # The composite indexes lead with the same column, so the single-column ones are redundant.
+    with op.batch_alter_table('notification', schema=None) as batch_op:
+        batch_op.create_index('ix_notification_user_id_created_at', ['user_id', 'created_at', 'id'], unique=False)
+        batch_op.drop_index('ix_notification_user_id')
+
+    with op.batch_alter_table('doctor_review_request', schema=None) as batch_op:
+        batch_op.create_index('ix_doctor_review_request_doctor_id_updated_at', ['doctor_id', 'updated_at', 'id'], unique=False)
+        batch_op.create_index('ix_doctor_review_request_patient_id_updated_at', ['patient_id', 'updated_at', 'id'], unique=False)
+        batch_op.drop_index('ix_doctor_review_request_doctor_id')
+        batch_op.drop_index('ix_doctor_review_request_patient_id')
+
+
+def downgrade():
+    with op.batch_alter_table('doctor_review_request', schema=None) as batch_op:
+        batch_op.create_index('ix_doctor_review_request_patient_id', ['patient_id'], unique=False)
+        batch_op.create_index('ix_doctor_review_request_doctor_id', ['doctor_id'], unique=False)
+        batch_op.drop_index('ix_doctor_review_request_patient_id_updated_at')
+        batch_op.drop_index('ix_doctor_review_request_doctor_id_updated_at')
+
+    with op.batch_alter_table('notification', schema=None) as batch_op:
+        batch_op.create_index('ix_notification_user_id', ['user_id'], unique=False)
+        batch_op.drop_index('ix_notification_user_id_created_at')
+
+    with op.batch_alter_table('result', schema=None) as batch_op:
+        batch_op.drop_index('ix_result_user_id_timestamp')
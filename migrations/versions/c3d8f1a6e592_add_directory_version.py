@@ -0,0 +1,28 @@
+"""Add directory version counter
+
+Revision ID: c3d8f1a6e592
+Revises: b0c6e4f2d871
+Create Date: 2026-10-17 18:41:09.204417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3d8f1a6e592'
+down_revision = 'b0c6e4f2d871'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('directory_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('directory_version')
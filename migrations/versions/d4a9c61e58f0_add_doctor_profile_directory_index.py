@@ -0,0 +1,26 @@
+"""Add doctor profile directory index
+
+Revision ID: d4a9c61e58f0
+Revises: b71d4e09c2a5
+Create Date: 2026-10-17 13:05:12.418830
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a9c61e58f0'
+down_revision = 'b71d4e09c2a5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('doctor_profile', schema=None) as batch_op:
+        batch_op.create_index('ix_doctor_profile_created_at', ['created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('doctor_profile', schema=None) as batch_op:
+        batch_op.drop_index('ix_doctor_profile_created_at')
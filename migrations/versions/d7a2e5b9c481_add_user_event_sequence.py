@@ -0,0 +1,47 @@
+"""Number user events per user in commit order
+
+Revision ID: d7a2e5b9c481
+Revises: c3d8f1a6e592
+Create Date: 2026-10-17 21:12:37.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a2e5b9c481'
+down_revision = 'c3d8f1a6e592'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_event_sequence',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('last_seq', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    with op.batch_alter_table('user_event', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('seq', sa.BigInteger(), nullable=True))
+
+    # Existing events keep their ids as seq, so Last-Event-IDs that clients
+    # already hold stay valid.
+    op.execute('UPDATE user_event SET seq = id')
+    op.execute('INSERT INTO user_event_sequence (user_id, last_seq) '
+               'SELECT user_id, MAX(id) FROM user_event GROUP BY user_id')
+
+    with op.batch_alter_table('user_event', schema=None) as batch_op:
+        batch_op.alter_column('seq', existing_type=sa.BigInteger(), nullable=False)
+        batch_op.drop_index('ix_user_event_user_id_id')
+        batch_op.create_index('uq_user_event_user_id_seq', ['user_id', 'seq'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('user_event', schema=None) as batch_op:
+        batch_op.drop_index('uq_user_event_user_id_seq')
+        batch_op.create_index('ix_user_event_user_id_id', ['user_id', 'id'], unique=False)
+        batch_op.drop_column('seq')
+
+    op.drop_table('user_event_sequence')
@@ -0,0 +1,63 @@
+"""Add result trend rollup
+
+Revision ID: e2f7a3b8c915
+Revises: d4a9c61e58f0
+Create Date: 2026-10-17 14:21:48.207663
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2f7a3b8c915'
+down_revision = 'd4a9c61e58f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('result_trend',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('disease', sa.String(length=50), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('probability_min', sa.Float(), nullable=False),
+    sa.Column('probability_max', sa.Float(), nullable=False),
+    sa.Column('probability_sum', sa.Float(), nullable=False),
+    sa.Column('latest_probability', sa.Float(), nullable=False),
+    sa.Column('latest_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'day', 'disease', name='uq_result_trend_user_day_disease')
+    )
+
+    # Backfill from existing results (same as `flask rebuild-trends`, which
+    # also puts results without a timestamp on the current day).
+    now = datetime.utcnow()
+    op.execute(sa.text("""
+        INSERT INTO result_trend (user_id, disease, day, count, probability_min, probability_max,
+                                  probability_sum, latest_probability, latest_at)
+        SELECT user_id, disease_selected, DATE(COALESCE(timestamp, :now)), COUNT(*),
+               MIN(COALESCE(probability, 0)), MAX(COALESCE(probability, 0)), SUM(COALESCE(probability, 0)), 0,
+               MAX(COALESCE(timestamp, :now))
+        FROM result
+        GROUP BY user_id, disease_selected, DATE(COALESCE(timestamp, :now))
+    """).bindparams(now=now))
+    op.execute(sa.text("""
+        UPDATE result_trend SET latest_probability = COALESCE((
+            SELECT r.probability FROM result r
+            WHERE r.user_id = result_trend.user_id
+              AND r.disease_selected = result_trend.disease
+              AND COALESCE(r.timestamp, :now) = result_trend.latest_at
+            ORDER BY r.id DESC
+            LIMIT 1
+        ), 0)
+    """).bindparams(now=now))
+
+
+def downgrade():
+    op.drop_table('result_trend')
@@ -0,0 +1,34 @@
+"""Add notification counter
+
+Revision ID: f58c0d2e6a14
+Revises: e2f7a3b8c915
+Create Date: 2026-10-17 15:02:33.516092
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f58c0d2e6a14'
+down_revision = 'e2f7a3b8c915'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('notification_counter',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('unread_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+    op.get_bind().execute(sa.text(
+        "INSERT INTO notification_counter (user_id, unread_count) "
+        "SELECT user_id, COUNT(*) FROM notification WHERE is_read = :false GROUP BY user_id"
+    ), {"false": False})
+
+
+def downgrade():
+    op.drop_table('notification_counter')
@@ -1,5 +1,5 @@
 from app import create_app, db
-from sqlalchemy import text
+from sqlalchemy import text, inspect
 
 app = create_app()
 
@@ -28,5 +28,135 @@ def update_schema():
         except Exception as e:
             print(f"Notification: Schema update might have already been applied or failed: {e}")
 
+        add_user_event_seq(engine)
+        add_missing_columns(engine)
+        add_missing_indexes(engine)
+        backfill_notification_counters(engine)
+        backfill_user_event_sequences(engine)
+        backfill_result_trends(engine)
+        sync_doctor_search(engine)
+
+
+def add_user_event_seq(engine):
+    """
+    Add user_event.seq (see app.events) to an existing outbox. It is NOT NULL
+    in the model, so add_missing_columns would skip it; existing events take
+    their ids as seq, which keeps the Last-Event-IDs clients hold valid.
+    """
+    inspector = inspect(engine)
+    if 'user_event' not in inspector.get_table_names():
+        return
+    if 'seq' in {c['name'] for c in inspector.get_columns('user_event')}:
+        return
+    with engine.begin() as conn:
+        conn.execute(text('ALTER TABLE user_event ADD COLUMN seq BIGINT'))
+        conn.execute(text('UPDATE user_event SET seq = id'))
+    print("Added column user_event.seq.")
+
+
+def add_missing_columns(engine):
+    """
+    Add nullable model columns that existing tables lack.
+
+    init_db.py only creates missing tables, so columns added to models later
+    (e.g. result.model_version) would otherwise never reach a deployed database.
+    """
+    # Make sure every model is registered on the metadata.
+    from app import models  # noqa: F401
+
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {c['name'] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable and column.server_default is None:
+                print(f"Skipping {table.name}.{column.name}: NOT NULL without server default; use a migration.")
+                continue
+            ddl_type = column.type.compile(dialect=engine.dialect)
+            ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {ddl_type}'
+            if column.server_default is not None:
+                default = column.server_default.arg
+                if isinstance(default, str):
+                    default = "'" + default.replace("'", "''") + "'"
+                else:
+                    default = default.text
+                ddl += f" DEFAULT {default}"
+            with engine.begin() as conn:
+                conn.execute(text(ddl))
+            print(f"Added column {table.name}.{column.name}.")
+
+
+def add_missing_indexes(engine):
+    """
+    Create model indexes that existing tables lack (e.g. the composite
+    per-user indexes), so create_all-based deployments get them as well.
+    """
+    from app import models  # noqa: F401
+
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {ix['name'] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            index.create(bind=engine)
+            print(f"Created index {index.name} on {table.name}.")
+
+
+def backfill_notification_counters(engine):
+    """Create unread counters (see app.notifications) for users whose notifications predate the table."""
+    with engine.begin() as conn:
+        added = conn.execute(text(
+            "INSERT INTO notification_counter (user_id, unread_count) "
+            "SELECT user_id, COUNT(*) FROM notification "
+            "WHERE is_read = :false AND user_id NOT IN (SELECT user_id FROM notification_counter) "
+            "GROUP BY user_id"
+        ), {"false": False}).rowcount
+    if added:
+        print(f"Backfilled unread notification counters for {added} users.")
+
+
+def backfill_user_event_sequences(engine):
+    """Start each user's event sequence (see app.events) after the events already in the outbox."""
+    with engine.begin() as conn:
+        added = conn.execute(text(
+            "INSERT INTO user_event_sequence (user_id, last_seq) "
+            "SELECT user_id, MAX(seq) FROM user_event "
+            "WHERE user_id NOT IN (SELECT user_id FROM user_event_sequence) "
+            "GROUP BY user_id"
+        )).rowcount
+    if added:
+        print(f"Backfilled event sequences for {added} users.")
+
+
+def backfill_result_trends(engine):
+    """Fill an empty trend rollup (see app.trends) from results that predate it."""
+    from app.trends import rebuild_trends
+
+    with engine.connect() as conn:
+        needed = conn.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM result) AND NOT EXISTS (SELECT 1 FROM result_trend)"
+        )).scalar()
+    if needed:
+        print(f"Backfilled risk trends from {rebuild_trends()} results.")
+
+
+def sync_doctor_search(engine):
+    """Create the doctor search indexes (see app.doctor_search) and rebuild them if out of step."""
+    from app import doctor_search
+
+    with engine.begin() as conn:
+        for index in doctor_search.INDEXES:
+            index.create(conn)
+        if doctor_search.is_stale(conn):
+            print(f"Rebuilt doctor search index ({doctor_search.rebuild(conn)} rows).")
+
 if __name__ == "__main__":
     update_schema()